@@ -32,6 +32,7 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'users.apps.UsersConfig',
     'documents.apps.DocumentsConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
@@ -167,6 +168,9 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'backend_static' / 'static' / 'media'
 
+# Results of background jobs are private, they are not served as media
+JOBS_RESULTS_ROOT = env('JOBS_RESULTS_ROOT', BASE_DIR / 'jobs_results')
+
 
 # Email settings
 EMAIL_USE_TLS = True
@@ -188,6 +192,51 @@ SHORT_END = "..."
 SHORT_DEFAULT_MAX_LENGTH = 20
 EXCEL_FORMATTER_TITLE_STRFTIME = '%Y_%m_%d_%H_%M_%S'
 EXCEL_FORMATTER_DATE_CREATION_COL_STRFTIME = '%Y_%m_%d_%H_%M_%S'
+# write only excel workbooks keep constant memory for any number of rows
+EXCEL_FORMATTER_WRITE_ONLY = True
+# rows of records values fetched from database at once for exports
+RECORDS_EXPORT_CHUNK_SIZE = 2000
+# rows of records of packages and excel exports made of them are cached
+# on disk, excel files are removed when cache is bigger than max size
+RECORDS_EXPORTS_CACHE_DIR = Path(
+    env('RECORDS_EXPORTS_CACHE_DIR', BASE_DIR / 'records_exports_cache')
+)
+RECORDS_EXPORTS_CACHE_MAX_SIZE = int(
+    env('RECORDS_EXPORTS_CACHE_MAX_SIZE', 256 * 2 ** 20)
+)
+# 'docx' - python-docx object model, 'xml' - raw xml parts rewriting
+DOCUMENTS_FORMATTER_ENGINE = env('DOCUMENTS_FORMATTER_ENGINE', 'docx')
+# max size of parsed templates cache of every worker in bytes
+DOCUMENTS_FORMATTER_CACHE_MAX_SIZE = int(
+    env('DOCUMENTS_FORMATTER_CACHE_MAX_SIZE', 64 * 2 ** 20)
+)
+# rendered documents cache on disk, max size in bytes
+RENDERED_DOCUMENTS_CACHE_DIR = env(
+    'RENDERED_DOCUMENTS_CACHE_DIR', BASE_DIR / 'rendered_documents_cache'
+)
+RENDERED_DOCUMENTS_CACHE_MAX_SIZE = int(
+    env('RENDERED_DOCUMENTS_CACHE_MAX_SIZE', 512 * 2 ** 20)
+)
+# rendered documents and exports are moved from memory to disk
+# when they are bigger than this size in bytes
+SPOOLED_FILE_MAX_SIZE = int(env('SPOOLED_FILE_MAX_SIZE', 2 ** 20))
+# size of pool of every worker for parallel rendering of documents
+DOCUMENTS_RENDER_WORKERS = int(env('DOCUMENTS_RENDER_WORKERS', 4))
+# long-lived render processes of every web worker, 0 - render in worker
+# itself. Every process has its own templates cache, so processes of all
+# web workers together should not be more than cores, heavy renders are
+# made by background jobs workers
+DOCUMENTS_RENDER_POOL_SIZE = int(env('DOCUMENTS_RENDER_POOL_SIZE', 2))
+# seconds, render process is killed after it, and render fails if
+# there is no free render process for this time
+DOCUMENTS_RENDER_POOL_TIMEOUT = int(env('DOCUMENTS_RENDER_POOL_TIMEOUT', 60))
+# render process is replaced after max tasks or max peak memory in bytes
+DOCUMENTS_RENDER_POOL_MAX_TASKS = int(
+    env('DOCUMENTS_RENDER_POOL_MAX_TASKS', 500)
+)
+DOCUMENTS_RENDER_POOL_MAX_MEMORY = int(
+    env('DOCUMENTS_RENDER_POOL_MAX_MEMORY', 512 * 2 ** 20)
+)
 
 
 # Models settings
@@ -228,6 +277,7 @@ DOCUMENT_TITLE_MIN_LENGTH = 7
 DOCUMENT_DESCRIPTION_MAX_LENGTH = 500
 DOCUMENTS_FOLDER_NAME = "documents"
 DOCUMENT_TITLE_SHORT_LENGTH = 20
+DOCUMENT_PLAN_SUFFIX = '.plan.json'
 
 
 # DocumentsPackage
@@ -237,6 +287,34 @@ DOCUMENTS_PACKAGE_TITLE_SHORT_LENGTH = 20
 DOCUMENTS_PACKAGE_DESCRIPTION_MAX_LENGTH = 500
 
 
+# Job
+JOB_KIND_MAX_LENGTH = 30
+JOB_STATUS_MAX_LENGTH = 20
+JOB_RESULT_MAX_LENGTH = 255
+# seconds between checks of queue by idle worker
+JOBS_POLL_INTERVAL = 1
+# pending jobs which worker tries to claim without skip locked support
+JOBS_CLAIM_CANDIDATES = 10
+# seconds, running job is claimed again if its worker did not extend
+# lease for this time, worker extends lease every heartbeat interval
+JOBS_LEASE_TIMEOUT = int(env('JOBS_LEASE_TIMEOUT', 300))
+JOBS_HEARTBEAT_INTERVAL = int(env('JOBS_HEARTBEAT_INTERVAL', 60))
+# job is failed after this number of claims which did not finish it
+JOBS_MAX_ATTEMPTS = 3
+# seconds, finished jobs and their results are deleted after this time
+JOBS_RESULTS_MAX_AGE = int(env('JOBS_RESULTS_MAX_AGE', 7 * 24 * 60 * 60))
+# seconds between deletions of expired jobs by idle worker
+JOBS_CLEANUP_INTERVAL = 60 * 60
+
+
+# ModelVersion
+MODEL_VERSION_MODEL_MAX_LENGTH = 100
+
+
+# Sequence
+SEQUENCE_NAME_MAX_LENGTH = 100
+
+
 # TemplateValue
 TEMPLATE_VALUE_VALUE_SHORT_LENGTH = 20
 TEMPLATE_VALUE_VALUE_MAX_LENGTH = 300
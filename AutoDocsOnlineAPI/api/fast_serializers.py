@@ -0,0 +1,109 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from rest_framework import serializers
+
+from documents.models import TemplateValue
+
+
+class ValuesSerializer(ABC):
+    """
+    Read-only serializer of rows of values() queryset for hot list
+    endpoints. It returns the same data as model serializer without model
+    instances and serializer fields for every row, relations to many are
+    fetched by one query for all rows.
+    Values must contain ordering fields of model for pagination.
+    """
+
+    values = ()
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def get_queryset(cls, queryset):
+        # related objects are not fetched for values
+        return queryset.prefetch_related(None).values(*cls.values)
+
+    @property
+    def data(self) -> list[dict]:
+        rows = list(self.rows)
+        self.prefetch(rows)
+
+        return [self.to_representation(row) for row in rows]
+
+    def prefetch(self, rows: list) -> None:
+        pass
+
+    @abstractmethod
+    def to_representation(self, row: dict) -> dict:
+        pass
+
+
+class FastTemplateSerializer(ValuesSerializer):
+    "TemplateSerializer of list."
+
+    values = (
+        'id',
+        'title',
+        'author__username',
+        'description',
+        'is_official',
+        'name_in_document',
+        'category__title',
+    )
+
+    def to_representation(self, row: dict) -> dict:
+        return {
+            'id': str(row['id']),
+            'title': row['title'],
+            'author': row['author__username'],
+            'description': row['description'],
+            'is_official': row['is_official'],
+            'name_in_document': row['name_in_document'],
+            'category': row['category__title'],
+        }
+
+
+class FastSelfRecordsSerializer(ValuesSerializer):
+    "GetSelfRecordsSerializer of list."
+
+    values = (
+        'id',
+        'documents_package_id',
+        'documents_package__title',
+        'creation_date',
+    )
+    # dates are formatted like in model serializer
+    creation_date = serializers.DateTimeField()
+
+    def prefetch(self, rows: list) -> None:
+        # the same relation as prefetch of templates values of records
+        templates_values = (
+            TemplateValue.objects
+            .filter(record__in=[row['id'] for row in rows])
+            .order_by(*TemplateValue.RECORD_ORDERING)
+            .values_list(
+                'record__id', 'template_id', 'template__title', 'value'
+            )
+        )
+
+        self.templates_values = defaultdict(list)
+        for record_id, template_id, title, value in templates_values:
+            self.templates_values[record_id].append({
+                'template': {'id': str(template_id), 'title': title},
+                'value': value,
+            })
+
+    def to_representation(self, row: dict) -> dict:
+        return {
+            'id': str(row['id']),
+            'documents_package': {
+                'id': str(row['documents_package_id']),
+                'title': row['documents_package__title'],
+            },
+            'templates_values': self.templates_values[row['id']],
+            'creation_date': self.creation_date.to_representation(
+                row['creation_date']
+            ),
+        }
@@ -0,0 +1,42 @@
+import json
+
+from rest_framework import renderers
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+    Allows '?format=csv' of records exports, which are streamed by view.
+    Renders only errors, as one line of text.
+    """
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if isinstance(data, dict):
+            data = ' '.join(map(str, data.values()))
+
+        return f'{data}\n'.encode(self.charset)
+
+
+class JSONLinesRenderer(renderers.BaseRenderer):
+    """
+    Allows '?format=jsonl' of records exports, which are streamed by view.
+    Renders only errors, as one json line.
+    """
+
+    media_type = 'application/jsonl'
+    format = 'jsonl'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return (json.dumps(data, ensure_ascii=False) + '\n').encode(
+            self.charset
+        )
@@ -1,9 +1,20 @@
+from zipfile import BadZipFile
+
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Prefetch
+from lxml.etree import XMLSyntaxError
 from rest_framework import serializers
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
-from core.serializers import Base64FileField, ModelWithUpdateForM2MFields
+from core.formatters import DocumentPlan, normalize_document
+from core.serializers import (
+    Base64FileField,
+    ModelWithUpdateForM2MFields,
+    SparseFieldsSerializer,
+)
 from documents.models import (
+    Category,
     Document,
     DocumentsPackage,
     Record,
@@ -11,10 +22,23 @@ from documents.models import (
     TemplateValue,
     UserDefaultTemplateValue,
 )
+from jobs.models import Job
 from users.serializers import UserSerializer
 
+from .permissions import IsAuthor, SelfRelatedOrIsDocumentsPackageAuthor
+
 
-class TemplateSerializer(serializers.ModelSerializer):
+class CategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = (
+            'id',
+            'title',
+            'description',
+        )
+
+
+class TemplateSerializer(SparseFieldsSerializer):
     category = serializers.StringRelatedField()
     author = serializers.SlugRelatedField('username', read_only=True)
 
@@ -29,6 +53,7 @@ class TemplateSerializer(serializers.ModelSerializer):
             'name_in_document',
             'category',
         )
+        select_related = ('author', 'category')
         read_only_fields = ('id', 'author', 'is_official', 'category')
 
 
@@ -49,7 +74,7 @@ class GetDocumentTemplateSerializer(TemplateSerializer):
         read_only_fields = ('id', 'author', 'is_official',)
 
 
-class GetDocumentSerializer(serializers.ModelSerializer):
+class GetDocumentSerializer(SparseFieldsSerializer):
     author = UserSerializer()
     templates = GetDocumentTemplateSerializer(many=True)
     file = serializers.CharField(source='file.url')
@@ -65,13 +90,19 @@ class GetDocumentSerializer(serializers.ModelSerializer):
             'templates',
             'creation_date',
         )
+        select_related = ('author',)
+        prefetch_related = ('templates',)
 
 
 class CreateUpdateDocumentSerializer(ModelWithUpdateForM2MFields):
+    """
+    Templates of document are linked by placeholders found in file,
+    placeholders without templates are returned as unknown.
+    Templates are read only, request with 'templates' is rejected.
+    """
     file = Base64FileField(required=True)
-    templates = serializers.PrimaryKeyRelatedField(
-        queryset=Template.objects.all(), many=True
-    )
+    templates = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    unknown_placeholders = serializers.SerializerMethodField()
 
     class Meta:
         model = Document
@@ -82,18 +113,58 @@ class CreateUpdateDocumentSerializer(ModelWithUpdateForM2MFields):
             'description',
             'file',
             'templates',
+            'unknown_placeholders',
             'creation_date',
         )
         read_only_fields = ('id', 'author', 'creation_date')
 
     def create(self, validated_data):
-        templates = validated_data.pop('templates')
-
         document = Document.objects.create(**validated_data)
-        document.templates.set(templates)
+        self.__link_templates(document)
 
         return document
 
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+
+        if 'file' in validated_data:
+            instance.templates.clear()
+            self.__link_templates(instance)
+
+        return instance
+
+    def validate(self, attrs):
+        if 'templates' in self.initial_data:
+            raise ValidationError({
+                'templates': [
+                    'Templates are linked by placeholders of file, '
+                    'they can not be set.'
+                ]
+            })
+
+        return attrs
+
+    def validate_file(self, value):
+        "Store normalized document, so placeholders are not split into runs."
+        try:
+            file_stream, self.__placeholders = normalize_document(value)
+        except (BadZipFile, KeyError, XMLSyntaxError):
+            raise ValidationError('File is not valid docx document.')
+
+        return ContentFile(file_stream.getvalue(), name=value.name)
+
+    def get_unknown_placeholders(self, obj) -> list[str]:
+        templates = {
+            template.name_in_document for template in obj.templates.all()
+        }
+
+        return sorted(DocumentPlan.ensure(obj.file.path).keys - templates)
+
+    def __link_templates(self, document) -> None:
+        document.templates.add(*Template.objects.filter(
+            name_in_document__in=self.__placeholders
+        ))
+
 
 class CreateUpdateTemplateValueSerializer(serializers.ModelSerializer):
     template = serializers.PrimaryKeyRelatedField(
@@ -112,7 +183,7 @@ class CreateUpdateTemplateValueSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class GetUserDefaultTemplateValueSerializer(serializers.ModelSerializer):
+class GetUserDefaultTemplateValueSerializer(SparseFieldsSerializer):
     value = serializers.CharField(source='template_value.value')
     template = TemplateSerializer(source='template_value.template')
 
@@ -123,6 +194,10 @@ class GetUserDefaultTemplateValueSerializer(serializers.ModelSerializer):
             'template',
             'value',
         )
+        select_related = (
+            'template_value__template__author',
+            'template_value__template__category',
+        )
         read_only_fields = ('id',)
 
 
@@ -185,7 +260,7 @@ class GetDocumentsPackageDocumentSerializer(serializers.ModelSerializer):
         )
 
 
-class GetDocumentsPackageSerializer(serializers.ModelSerializer):
+class GetDocumentsPackageSerializer(SparseFieldsSerializer):
     author = UserSerializer()
     documents = GetDocumentsPackageDocumentSerializer(many=True)
 
@@ -198,6 +273,8 @@ class GetDocumentsPackageSerializer(serializers.ModelSerializer):
             'documents',
             'description',
         )
+        select_related = ('author',)
+        prefetch_related = ('documents__templates',)
 
 
 class CreateUpdateDocumentsPackageSerializer(ModelWithUpdateForM2MFields):
@@ -252,6 +329,15 @@ class GetSimpleDocumentsPackageSerializer(
         )
 
 
+# values of record are returned in the same order by all serializers
+ORDERED_TEMPLATES_VALUES = Prefetch(
+    'templates_values',
+    queryset=TemplateValue.objects.select_related('template').order_by(
+        *TemplateValue.RECORD_ORDERING
+    ),
+)
+
+
 class GetSimpleTemplateValueSerializer(serializers.ModelSerializer):
     template = GetSimpleTemplateSerializer()
 
@@ -263,7 +349,7 @@ class GetSimpleTemplateValueSerializer(serializers.ModelSerializer):
         )
 
 
-class GetSelfRecordsSerializer(serializers.ModelSerializer):
+class GetSelfRecordsSerializer(SparseFieldsSerializer):
     documents_package = GetSimpleDocumentsPackageSerializer()
     templates_values = GetSimpleTemplateValueSerializer(many=True)
 
@@ -275,9 +361,11 @@ class GetSelfRecordsSerializer(serializers.ModelSerializer):
             'templates_values',
             'creation_date',
         )
+        select_related = ('documents_package',)
+        prefetch_related = (ORDERED_TEMPLATES_VALUES,)
 
 
-class GetDocumentsPackageRecordsSerializer(serializers.ModelSerializer):
+class GetDocumentsPackageRecordsSerializer(SparseFieldsSerializer):
     templates_values = GetSimpleTemplateValueSerializer(many=True)
 
     class Meta:
@@ -287,6 +375,7 @@ class GetDocumentsPackageRecordsSerializer(serializers.ModelSerializer):
             'templates_values',
             'creation_date',
         )
+        prefetch_related = (ORDERED_TEMPLATES_VALUES,)
 
 
 class CreateUpdateRecordSerializer(serializers.ModelSerializer):
@@ -368,3 +457,129 @@ class DownloadRecordDocumentSerializer(serializers.Serializer):
             )
 
         return data
+
+
+class GetJobSerializer(SparseFieldsSerializer):
+    class Meta:
+        model = Job
+        fields = (
+            'id',
+            'kind',
+            'params',
+            'status',
+            'error',
+            'creation_date',
+            'started_at',
+            'finished_at',
+        )
+
+
+class CreateJobSerializer(serializers.ModelSerializer):
+    """
+    Submit job. 'record' is required for 'document' and 'documents' jobs,
+    'document_id' for 'document' job, 'documents_package'
+    for 'records_excel' job. 'packages_excel' job exports chosen
+    'documents_packages' or all packages of user.
+    """
+    record = serializers.PrimaryKeyRelatedField(
+        queryset=Record.objects.all(), required=False, write_only=True
+    )
+    document_id = serializers.UUIDField(required=False, write_only=True)
+    documents_package = serializers.PrimaryKeyRelatedField(
+        queryset=DocumentsPackage.objects.all(),
+        required=False,
+        write_only=True,
+    )
+    documents_packages = serializers.ListField(
+        child=serializers.UUIDField(), required=False, write_only=True
+    )
+
+    class Meta:
+        model = Job
+        fields = (
+            'id',
+            'kind',
+            'record',
+            'document_id',
+            'documents_package',
+            'documents_packages',
+            'status',
+            'creation_date',
+        )
+        read_only_fields = ('id', 'status', 'creation_date')
+
+    def validate(self, data):
+        kind = data.get('kind')
+        record = data.pop('record', None)
+        document_id = data.pop('document_id', None)
+        documents_package = data.pop('documents_package', None)
+        documents_packages = data.pop('documents_packages', None)
+
+        if kind in (Job.DOCUMENT, Job.DOCUMENTS):
+            if record is None:
+                raise ValidationError('Record is required for this job.')
+
+            self.__check_permission(
+                SelfRelatedOrIsDocumentsPackageAuthor, record
+            )
+            data['params'] = {'record': str(record.pk)}
+
+        if kind == Job.DOCUMENT:
+            if not (
+                document_id
+                and record.documents_package.documents.filter(
+                    pk=document_id
+                ).exists()
+            ):
+                raise ValidationError(
+                    "Document with this id and "
+                    "related with this record does not exist."
+                )
+
+            data['params']['document_id'] = str(document_id)
+
+        if kind == Job.RECORDS_EXCEL:
+            if documents_package is None:
+                raise ValidationError(
+                    'Documents package is required for this job.'
+                )
+
+            self.__check_permission(IsAuthor, documents_package)
+            data['params'] = {'documents_package': str(documents_package.pk)}
+
+        if kind == Job.PACKAGES_EXCEL:
+            data['params'] = {
+                'documents_packages': self.__get_documents_packages(
+                    documents_packages
+                )
+            }
+
+        return super().validate(data)
+
+    def __get_documents_packages(self, pks) -> list[str]:
+        "Return ids of chosen or all documents packages of user."
+        user_packages = DocumentsPackage.objects.filter(
+            author=self.context['request'].user
+        )
+        if pks:
+            user_packages = user_packages.filter(pk__in=pks)
+
+        found = [str(pk) for pk in user_packages.values_list('pk', flat=True)]
+
+        if pks and len(found) != len(set(pks)):
+            raise ValidationError(
+                "Documents packages with these ids and "
+                "related with this user do not exist."
+            )
+
+        if not found:
+            raise ValidationError('There are no documents packages.')
+
+        return found
+
+    def __check_permission(self, permission, obj):
+        permission = permission()
+        request = self.context['request']
+
+        if not permission.has_object_permission(request, None, obj):
+            raise PermissionDenied(permission.message)
@@ -0,0 +1,539 @@
+import base64
+import json
+from urllib.parse import parse_qs, urlparse
+
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.serializers import apply_prefetch_plan
+from documents.models import (
+    CATALOG_SEQUENCE,
+    Category,
+    Document,
+    DocumentDocumentsPackage,
+    DocumentsPackage,
+    DocumentTemplate,
+    Record,
+    RecordTemplateValue,
+    Sequence,
+    Template,
+    TemplateValue,
+    UserDefaultTemplateValue,
+)
+from jobs.models import Job
+from documents.testing import (
+    TemporaryFilesMixin,
+    make_docx_file,
+    make_documents_package,
+    make_name,
+    make_records,
+    make_templates,
+)
+from users.models import User
+
+from .fast_serializers import FastSelfRecordsSerializer, FastTemplateSerializer
+from .serializers import GetSelfRecordsSerializer, TemplateSerializer
+
+
+class QueriesTest(TemporaryFilesMixin, APITestCase):
+    """
+    Lists and objects are read by constant number of queries, which does
+    not depend on number of objects and their related objects.
+    """
+
+    sizes = (10, 200)
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.client.force_authenticate(self.user)
+
+        # objects of retrieve, their relations grow with data size
+        self.templates = make_templates(self.user, 1)
+        self.documents_package = make_documents_package(
+            self.user, self.templates
+        )
+        self.document = self.documents_package.documents.get()
+        self.size = 0
+
+    def grow(self, size: int) -> None:
+        """
+        Add objects of other authors, relations of objects of retrieve,
+        default values and jobs of user. Objects are created in bulk.
+        """
+        indexes = range(self.size, size)
+        authors = User.objects.bulk_create(
+            User(username=f'author{index}', email=f'author{index}@ex.com')
+            for index in indexes
+        )
+        categories = Category.objects.bulk_create(
+            Category(title=f'Category {index}', description='Category')
+            for index in indexes
+        )
+        templates = Template.objects.bulk_create(
+            Template(
+                author=author,
+                title=f'template {index} {position}',
+                name_in_document=(
+                    f'{{{{template{make_name(index)}_{make_name(position)}}}}}'
+                ),
+                category=category,
+            )
+            for index, author, category in zip(indexes, authors, categories)
+            for position in range(2)
+        )
+        documents = Document.objects.bulk_create(
+            Document(
+                author=self.user,
+                title=f'Package {index} document',
+                file=self.document.file.name,
+            )
+            for index in indexes
+        )
+        documents_packages = DocumentsPackage.objects.bulk_create(
+            DocumentsPackage(title=f'Package {index}', author=self.user)
+            for index in indexes
+        )
+        pairs = list(zip(templates[::2], templates[1::2]))
+
+        DocumentTemplate.objects.bulk_create([
+            *(
+                DocumentTemplate(document=document, template=template)
+                for document, pair in zip(documents, pairs)
+                for template in pair
+            ),
+            *(
+                DocumentTemplate(document=self.document, template=template)
+                for template in templates
+            ),
+        ])
+        DocumentDocumentsPackage.objects.bulk_create([
+            *(
+                DocumentDocumentsPackage(
+                    document=document, documents_package=documents_package
+                )
+                for document, documents_package in zip(
+                    documents, documents_packages
+                )
+            ),
+            *(
+                DocumentDocumentsPackage(
+                    document=document,
+                    documents_package=self.documents_package,
+                )
+                for document in documents
+            ),
+        ])
+
+        # two records of every package and one of package of retrieve
+        records = [
+            (Record(user=self.user, documents_package=package), pair)
+            for package, pair in zip(documents_packages, pairs)
+            for _ in range(2)
+        ] + [
+            (
+                Record(
+                    user=self.user, documents_package=self.documents_package
+                ),
+                self.templates,
+            )
+            for _ in indexes
+        ]
+        Record.objects.bulk_create(record for record, _ in records)
+        values = TemplateValue.objects.bulk_create(
+            TemplateValue(template=template, value=str(record.pk))
+            for record, record_templates in records
+            for template in record_templates
+        )
+        values = iter(values)
+        RecordTemplateValue.objects.bulk_create(
+            RecordTemplateValue(record=record, template_value=next(values))
+            for record, record_templates in records
+            for _ in record_templates
+        )
+
+        UserDefaultTemplateValue.objects.bulk_create(
+            UserDefaultTemplateValue(user=self.user, template_value=value)
+            for value in TemplateValue.objects.bulk_create(
+                TemplateValue(template=template, value='Default')
+                for template in templates
+            )
+        )
+        Job.objects.bulk_create(
+            Job(user=self.user, kind=Job.RECORDS_EXCEL) for _ in indexes
+        )
+
+        self.size = size
+
+    def assertConstantQueries(self, url: str, queries: int) -> None:
+        for size in self.sizes:
+            self.grow(size)
+
+            with self.subTest(size=size), self.assertNumQueries(queries):
+                response = self.client.get(url, {'limit': 1000})
+                self.assertEqual(response.status_code, 200)
+
+            # lists contain objects of every size step
+            data = response.data
+            if isinstance(data, dict) and 'results' in data:
+                data = data['results']
+            if isinstance(data, list):
+                self.assertGreaterEqual(len(data), size)
+
+    def test_templates(self):
+        # validators, page
+        self.assertConstantQueries('/api/templates/', 2)
+
+    def test_template(self):
+        # validators, object
+        self.assertConstantQueries(
+            f'/api/templates/{self.templates[0].pk}/', 2
+        )
+
+    def test_documents(self):
+        # validators, page, templates
+        self.assertConstantQueries('/api/documents/', 3)
+
+    def test_document(self):
+        # validators, object, templates
+        self.assertConstantQueries(f'/api/documents/{self.document.pk}/', 3)
+
+    def test_documents_packages(self):
+        # validators, page, documents, templates of documents
+        self.assertConstantQueries('/api/documents_packages/', 4)
+
+    def test_documents_package(self):
+        # validators, object, documents, templates of documents
+        self.assertConstantQueries(
+            f'/api/documents_packages/{self.documents_package.pk}/', 4
+        )
+
+    def test_records(self):
+        # page, templates values
+        self.assertConstantQueries('/api/records/', 2)
+
+    def test_documents_package_records(self):
+        # package, its author, page, templates values with templates
+        self.assertConstantQueries(
+            f'/api/records/documents_package/{self.documents_package.pk}/',
+            4,
+        )
+
+    def test_default_templates_values(self):
+        # values with templates, their authors and categories
+        self.assertConstantQueries('/api/default_templates_values/', 1)
+
+    def test_jobs(self):
+        self.assertConstantQueries('/api/jobs/', 1)
+
+
+class ValuesSerializersTest(TemporaryFilesMixin, APITestCase):
+    "Values serializers return the same data as model serializers."
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.client.force_authenticate(self.user)
+
+        category = Category.objects.create(
+            title='Category', description='Category'
+        )
+        templates = [
+            *make_templates(self.user, 3, category=category),
+            *make_templates(self.user, 2, prefix='other'),
+        ]
+        # values are not created in order of titles
+        templates.reverse()
+        documents_package = make_documents_package(self.user, templates)
+        make_records(documents_package, self.user, templates, 3)
+
+    def assertSameData(self, queryset, serializer, values_serializer):
+        self.assertEqual(
+            values_serializer(values_serializer.get_queryset(queryset)).data,
+            serializer(
+                apply_prefetch_plan(queryset, serializer()), many=True
+            ).data,
+        )
+
+    def test_templates(self):
+        self.assertSameData(
+            Template.objects.all(), TemplateSerializer, FastTemplateSerializer
+        )
+
+    def test_records(self):
+        self.assertSameData(
+            Record.objects.all(),
+            GetSelfRecordsSerializer,
+            FastSelfRecordsSerializer,
+        )
+
+    def test_sparse_fields_use_model_serializer(self):
+        response = self.client.get('/api/records/', {'fields': 'id'})
+        self.assertEqual(
+            [set(record) for record in response.data['results']],
+            [{'id'}] * 3,
+        )
+
+        response = self.client.get(
+            '/api/records/',
+            {'fields': 'id,templates_values', 'expand': 'templates_values'},
+        )
+        self.assertEqual(
+            {
+                tuple(value)
+                for record in response.json()['results']
+                for value in record['templates_values']
+            },
+            {('template', 'value')},
+        )
+
+
+class TemplatesChangesTest(APITestCase):
+    "Delta sync of official templates catalog."
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(
+            title='Category', description='Category'
+        )
+        self.official = make_templates(
+            self.user, 2, prefix='official',
+            is_official=True, category=self.category,
+        )
+
+    def get_changes(self, since=None) -> dict:
+        params = {} if since is None else {'since': since}
+        response = self.client.get('/api/templates/changes/', params)
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def test_full_sync(self):
+        make_templates(self.user, 1, prefix='private')
+        changes = self.get_changes()
+
+        self.assertEqual(
+            {template['id'] for template in changes['templates']},
+            {str(template.pk) for template in self.official},
+        )
+        self.assertEqual(len(changes['categories']), 1)
+        self.assertEqual(changes['deleted_templates'], [])
+
+    def test_private_templates_do_not_take_versions(self):
+        version = Sequence.objects.get_value(CATALOG_SEQUENCE)
+        private, = make_templates(self.user, 1, prefix='private')
+        private.description = 'Changed'
+        private.save()
+
+        self.assertEqual(Sequence.objects.get_value(CATALOG_SEQUENCE), version)
+        self.assertEqual(self.get_changes(version)['templates'], [])
+
+    def test_changes_since_version(self):
+        version = self.get_changes()['version']
+        changed, demoted = self.official
+
+        changed.description = 'Changed'
+        changed.save(update_fields=['description'])
+        demoted.is_official = False
+        demoted.save()
+        changes = self.get_changes(version)
+
+        self.assertEqual(
+            [template['id'] for template in changes['templates']],
+            [str(changed.pk)],
+        )
+        self.assertEqual(changes['deleted_templates'], [str(demoted.pk)])
+
+        version = changes['version']
+        category_pk = str(self.category.pk)
+        self.category.delete()
+        changes = self.get_changes(version)
+
+        self.assertEqual(
+            [template['category'] for template in changes['templates']],
+            [None],
+        )
+        self.assertEqual(changes['deleted_categories'], [category_pk])
+        self.assertEqual(self.get_changes(changes['version'])['templates'], [])
+
+    def test_invalid_since(self):
+        response = self.client.get('/api/templates/changes/', {'since': -1})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTest(APITestCase):
+    "ETags change only with data read by responses."
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.client.force_authenticate(self.user)
+        self.official, = make_templates(
+            self.user, 1, prefix='official', is_official=True
+        )
+
+    def get(self, url: str, etag: str = None):
+        headers = {} if etag is None else {'HTTP_IF_NONE_MATCH': etag}
+        return self.client.get(url, **headers)
+
+    def test_private_templates_keep_catalog_etag(self):
+        other = User.objects.create(
+            username='other', email='other@example.com'
+        )
+        url = '/api/templates/?is_official=true'
+        etag = self.get(url)['ETag']
+
+        make_templates(other, 1, prefix='private')
+        self.assertEqual(self.get(url, etag).status_code, 304)
+
+        # all templates of user are changed by private ones
+        response = self.get('/api/templates/')
+        make_templates(self.user, 1, prefix='other')
+        self.assertEqual(
+            self.get('/api/templates/', response['ETag']).status_code, 200
+        )
+
+        self.official.description = 'Changed'
+        self.official.save()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_users_not_read_fields_keep_etag(self):
+        url = '/api/documents/'
+        etag = self.get(url)['ETag']
+
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.user.confirmation_code = 'code'
+        self.user.save()
+        self.assertEqual(self.get(url, etag).status_code, 304)
+
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(self.get(url, etag).status_code, 200)
+
+
+class KeysetPaginationTest(TemporaryFilesMixin, APITestCase):
+    "Crafted cursors are not found instead of server errors."
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.client.force_authenticate(self.user)
+        templates = make_templates(self.user, 3)
+        documents_package = make_documents_package(self.user, templates)
+        make_records(documents_package, self.user, templates, 3)
+
+    def get_cursor(self, url: str) -> list:
+        "Decoded cursor of next page of first page of one object."
+        response = self.client.get(url, {'limit': 1})
+        cursor = parse_qs(urlparse(response.data['next']).query)['cursor']
+
+        return json.loads(base64.urlsafe_b64decode(cursor[0]))
+
+    def assertBadCursors(self, url: str, bad_values: list) -> None:
+        reverse, ordering, _ = self.get_cursor(url)
+        for values in bad_values:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps([reverse, ordering, values]).encode()
+            ).decode()
+
+            with self.subTest(values=values):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_valid_cursor(self):
+        for url in ('/api/templates/', '/api/records/'):
+            reverse, ordering, values = self.get_cursor(url)
+            cursor = base64.urlsafe_b64encode(
+                json.dumps([reverse, ordering, values]).encode()
+            ).decode()
+
+            response = self.client.get(url, {'limit': 1, 'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), 1)
+
+    def test_templates_bad_cursors(self):
+        self.assertBadCursors(
+            '/api/templates/',
+            [['template 0', 'x'], [None, None], ['template 0', None], [1]],
+        )
+
+    def test_records_bad_cursors(self):
+        self.assertBadCursors(
+            '/api/records/',
+            [['notadate', 'x'], [None, None], [[], {}], 'notalist'],
+        )
+
+    def test_bad_cursor_encoding(self):
+        for cursor in ('notbase64!', base64.urlsafe_b64encode(b'[0]')):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    '/api/records/', {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+class DocumentUploadTest(TemporaryFilesMixin, APITestCase):
+    "Templates of uploaded document are linked by placeholders of file."
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.client.force_authenticate(self.user)
+        self.templates = make_templates(self.user, 2)
+
+    def make_data(self, *names, **fields) -> dict:
+        file = base64.b64encode(make_docx_file(names).read()).decode()
+        return {
+            'title': 'Document',
+            'file': f'data:document;docx;base64;{file}',
+            **fields,
+        }
+
+    def test_templates_are_linked_by_placeholders(self):
+        etag = self.client.get('/api/documents/')['ETag']
+        response = self.client.post(
+            '/api/documents/',
+            self.make_data(self.templates[0].name_in_document, '{{unknown}}'),
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['templates'], [self.templates[0].pk])
+        self.assertEqual(
+            response.data['unknown_placeholders'], ['{{unknown}}']
+        )
+        # links are versioned by signals of templates of document
+        self.assertNotEqual(self.client.get('/api/documents/')['ETag'], etag)
+
+        response = self.client.patch(
+            f'/api/documents/{response.data["id"]}/',
+            self.make_data(self.templates[1].name_in_document),
+            format='json',
+        )
+        self.assertEqual(response.data['templates'], [self.templates[1].pk])
+
+    def test_templates_can_not_be_set(self):
+        response = self.client.post(
+            '/api/documents/',
+            self.make_data(templates=[str(self.templates[0].pk)]),
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('templates', response.data)
+        self.assertFalse(Document.objects.exists())
@@ -7,6 +7,7 @@ from rest_framework.routers import DefaultRouter as Router
 
 from .views import (
     DocumentViewSet,
+    JobViewSet,
     RecordsViewSet,
     DocumentsPackageViewSet,
     TemplateViewSet,
@@ -28,6 +29,7 @@ router.register(
     'documents_packages'
 )
 router.register('records', RecordsViewSet, 'records')
+router.register('jobs', JobViewSet, 'jobs')
 
 
 urlpatterns = [
@@ -1,22 +1,56 @@
-from django.shortcuts import get_list_or_404, get_object_or_404
-from core.formatters import DocumentsFormatter, ExcelFormatter
-from django.http.response import FileResponse
+from urllib.parse import quote
+
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from core.formatters import (
+    DocumentsFormatter,
+    RecordsFormatter,
+    RenderTimeoutError,
+)
+from django.http import Http404
+from django.http.response import FileResponse, StreamingHttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+    quote_etag,
+)
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets, filters
+from rest_framework import filters, serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404 as _get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-
-
+from rest_framework.settings import api_settings
+
+from core.pagination import KeysetPagination
+from core.serializers import apply_prefetch_plan
+from documents.exports import (
+    get_filled_documents_zip,
+    get_records_excel,
+    get_records_lines,
+)
 from documents.models import (
+    CATALOG_SEQUENCE,
+    Category,
     Document,
+    DocumentDocumentsPackage,
     DocumentsPackage,
+    DocumentTemplate,
+    ModelVersion,
     Record,
+    Sequence,
     Template,
+    Tombstone,
     UserDefaultTemplateValue,
 )
+from jobs.models import Job
+from users.models import User
 
+from .fast_serializers import (
+    FastSelfRecordsSerializer,
+    FastTemplateSerializer,
+)
 from .filters import (
     FilterDocument,
     FilterDocumentPackage,
@@ -30,15 +64,19 @@ from .permissions import (
     IsAuthorOrReadOnly,
     SelfRelatedOrIsDocumentsPackageAuthor,
 )
+from .renderers import CSVRenderer, JSONLinesRenderer
 from .serializers import (
+    CategorySerializer,
     CreateUpdateRecordSerializer,
     CreateUpdateDocumentsPackageSerializer,
     CreateUpdateDocumentSerializer,
     DownloadRecordDocumentSerializer,
     CreateUpdateUserDefaultTemplateValueSerializer,
+    CreateJobSerializer,
     GetDocumentsPackageSerializer,
     GetDocumentsPackageRecordsSerializer,
     GetDocumentSerializer,
+    GetJobSerializer,
     GetSelfRecordsSerializer,
     GetUserDefaultTemplateValueSerializer,
     TemplateSerializer,
@@ -48,7 +86,80 @@ from .serializers import (
 HTTP_METHOD_NAMES_WITHOUT_PUT = ('get', 'post', 'patch', 'delete',)
 
 
+class PrefetchPlanMixin:
+    "Apply prefetch plan of serializer to queryset of list and object."
+
+    def filter_queryset(self, queryset):
+        return apply_prefetch_plan(
+            super().filter_queryset(queryset), self.get_serializer()
+        )
+
+
+class ConditionalGetMixin:
+    """
+    List and object responses validated by versions of models read by
+    view. Not modified responses are 304 without queryset and
+    serialization.
+    """
+    versioned_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.__get_conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.__get_conditional(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_etag(self, key: str) -> str:
+        "Return ETag of data read by view, it is computed before reading."
+        return ModelVersion.objects.get_etag(self.versioned_models, key)
+
+    def __get_conditional(self, view, request, *args, **kwargs):
+        # data depends on url, its query and permissions of user, only
+        # ETag is sent: modification time has one second resolution
+        etag = quote_etag(
+            self.get_etag(f'{request.user.pk}{request.build_absolute_uri()}')
+        )
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = view(request, *args, **kwargs)
+
+        if response.status_code in (status.HTTP_200_OK, 304):
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Authorization',))
+
+        return response
+
+
+class ValuesListMixin:
+    """
+    List by values serializer of view, model serializer is used
+    only if its fields or expanded fields are chosen.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if {'fields', 'expand'} & set(request.query_params):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.values_serializer_class.get_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                self.values_serializer_class(page).data
+            )
+
+        return Response(self.values_serializer_class(queryset).data)
+
+
 class GetCreateUpdateViewSet(
+    PrefetchPlanMixin,
     viewsets.mixins.CreateModelMixin,
     viewsets.mixins.RetrieveModelMixin,
     viewsets.mixins.ListModelMixin,
@@ -60,6 +171,7 @@ class GetCreateUpdateViewSet(
 
 
 class ListCreateViewSet(
+    PrefetchPlanMixin,
     viewsets.mixins.ListModelMixin,
     viewsets.mixins.CreateModelMixin,
     viewsets.GenericViewSet
@@ -67,30 +179,118 @@ class ListCreateViewSet(
     pass
 
 
-class TemplateViewSet(viewsets.ModelViewSet):
+class TemplateViewSet(
+    ConditionalGetMixin,
+    ValuesListMixin,
+    PrefetchPlanMixin,
+    viewsets.ModelViewSet,
+):
     permission_classes = (IsAuthenticated, IsAuthorOrReadOnly)
     http_method_names = HTTP_METHOD_NAMES_WITHOUT_PUT
 
     queryset = Template.objects.all()
     serializer_class = TemplateSerializer
+    values_serializer_class = FastTemplateSerializer
+    versioned_models = (Template, Category, User)
 
     filterset_class = FilterTemplate
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
+    filter_backends = (
+        DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter,
+    )
     search_fields = ('^title',)
+    ordering_fields = ('title',)
+    pagination_class = KeysetPagination
+
+    def get_etag(self, key: str) -> str:
+        # official catalog is versioned by its sequence, so private
+        # templates of users do not change it
+        if self.action != 'list' or not self.__is_catalog():
+            return super().get_etag(key)
+
+        return ModelVersion.objects.get_etag(
+            (User,), f'{key}{Sequence.objects.get_value(CATALOG_SEQUENCE)}'
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def __is_catalog(self) -> bool:
+        form = self.filterset_class(
+            self.request.query_params, queryset=self.queryset.none()
+        ).form
+
+        return form.is_valid() and form.cleaned_data['is_official'] is True
 
-class DocumentViewSet(viewsets.ModelViewSet):
+    @action(
+        ['get'],
+        False,
+        permission_classes=(IsAuthenticated,),
+        filterset_class=None,
+        pagination_class=None,
+    )
+    def changes(self, request):
+        """
+        Official templates and categories created, updated and deleted
+        after catalog version '?since=', all of them without it. Client
+        deletes objects before update and keeps returned version.
+        """
+        since = request.query_params.get('since')
+        if since is not None:
+            since = serializers.IntegerField(min_value=0).run_validation(
+                since
+            )
+
+        # changes committed later have greater versions
+        version = Sequence.objects.get_value(CATALOG_SEQUENCE)
+        changed = Q(change_version__lte=version)
+        if since is not None:
+            changed &= Q(change_version__gt=since)
+
+        templates = FastTemplateSerializer.get_queryset(
+            Template.objects.filter(changed, is_official=True)
+        )
+        categories = Category.objects.filter(changed)
+        deleted = {
+            Template._meta.label_lower: [],
+            Category._meta.label_lower: [],
+        }
+        if since is not None:
+            tombstones = Tombstone.objects.filter(changed).values_list(
+                'model', 'object_id'
+            )
+            for model, object_id in tombstones:
+                deleted[model].append(object_id)
+
+        return Response({
+            'version': version,
+            'templates': FastTemplateSerializer(templates).data,
+            'deleted_templates': deleted[Template._meta.label_lower],
+            'categories': CategorySerializer(categories, many=True).data,
+            'deleted_categories': deleted[Category._meta.label_lower],
+        })
+
+
+class DocumentViewSet(
+    ConditionalGetMixin, PrefetchPlanMixin, viewsets.ModelViewSet
+):
+    """
+    Documents of users. Templates of document are linked by placeholders
+    found in uploaded file, so they are read only: create and update
+    with 'templates' are rejected with 400.
+    """
     permission_classes = (IsAuthenticated, IsAuthorOrReadOnly,)
     http_method_names = HTTP_METHOD_NAMES_WITHOUT_PUT
 
     queryset = Document.objects.all()
+    versioned_models = (Document, DocumentTemplate, Template, User)
 
     filterset_class = FilterDocument
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
+    filter_backends = (
+        DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter,
+    )
     search_fields = ('^title',)
+    ordering_fields = ('creation_date',)
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -140,15 +340,29 @@ class UserDefaultTemplateValueViewSet(GetCreateUpdateViewSet):
         return obj
 
 
-class DocumentsPackageViewSet(viewsets.ModelViewSet):
+class DocumentsPackageViewSet(
+    ConditionalGetMixin, PrefetchPlanMixin, viewsets.ModelViewSet
+):
     permission_classes = (IsAuthenticated, IsAuthorOrReadOnly,)
     http_method_names = HTTP_METHOD_NAMES_WITHOUT_PUT
 
     queryset = DocumentsPackage.objects.all()
+    versioned_models = (
+        DocumentsPackage,
+        DocumentDocumentsPackage,
+        Document,
+        DocumentTemplate,
+        Template,
+        User,
+    )
 
     filterset_class = FilterDocumentPackage
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
+    filter_backends = (
+        DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter,
+    )
     search_fields = ('^title',)
+    ordering_fields = ('title',)
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -160,14 +374,17 @@ class DocumentsPackageViewSet(viewsets.ModelViewSet):
         return CreateUpdateDocumentsPackageSerializer
 
 
-class RecordsViewSet(ListCreateViewSet):
+class RecordsViewSet(ValuesListMixin, ListCreateViewSet):
     permission_classes = (
         IsAuthenticated, SelfRelatedOrIsDocumentsPackageAuthor,
     )
     http_method_names = HTTP_METHOD_NAMES_WITHOUT_PUT
+    values_serializer_class = FastSelfRecordsSerializer
 
     filterset_class = FilterRecords
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter,)
+    ordering_fields = ('creation_date',)
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -197,10 +414,20 @@ class RecordsViewSet(ListCreateViewSet):
 
         self.check_object_permissions(request, documents_package)
 
-        records = get_list_or_404(Record, documents_package=documents_package)
-        serializer = GetDocumentsPackageRecordsSerializer(records, many=True)
+        context = self.get_serializer_context()
+        records = apply_prefetch_plan(
+            documents_package.records.all(),
+            GetDocumentsPackageRecordsSerializer(context=context),
+        )
+        page = self.paginate_queryset(records)
+        if not page:
+            raise Http404
+
+        serializer = GetDocumentsPackageRecordsSerializer(
+            page, many=True, context=context
+        )
 
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
     @action(
         ['get'],
@@ -208,22 +435,38 @@ class RecordsViewSet(ListCreateViewSet):
         url_path='documents_package/(?P<pk>[^/.]+)/download',
         permission_classes=(IsAuthenticated, IsAuthor,),
         filterset_class=None,
+        renderer_classes=(
+            *api_settings.DEFAULT_RENDERER_CLASSES,
+            CSVRenderer,
+            JSONLinesRenderer,
+        ),
     )
     def download_documents_package_records(self, request, pk=None):
+        "Excel of records, '?format=csv' and '?format=jsonl' are streamed."
         documents_package = get_object_or_404(DocumentsPackage, pk=pk)
         self.check_object_permissions(request, documents_package)
 
-        records = get_list_or_404(Record, documents_package=documents_package)
-        templates = documents_package.templates
+        if not documents_package.records.exists():
+            raise Http404
 
-        excel, filename = ExcelFormatter(
-            records, templates, title=documents_package.title
-        ).make_excel_data_summary()
+        export_format = request.accepted_renderer.format
+        if export_format in RecordsFormatter.formats:
+            lines, filename = get_records_lines(
+                documents_package, export_format
+            )
 
-        return FileResponse(
-            excel,
-            filename=filename + '.xlsx'
-        )
+            response = StreamingHttpResponse(
+                lines, content_type=request.accepted_renderer.media_type
+            )
+            response['Content-Disposition'] = (
+                f"attachment; filename*=utf-8''{quote(filename)}"
+            )
+
+            return response
+
+        excel, filename = get_records_excel(documents_package)
+
+        return FileResponse(excel, filename=filename)
 
     @action(
         ['get'],
@@ -233,6 +476,84 @@ class RecordsViewSet(ListCreateViewSet):
         filterset_class=None,
     )
     def download_filled_document(self, request, pk, document_id):
+        document, formatter = self.__get_filled_document(
+            request, pk, document_id
+        )
+
+        # record can not be changed, so filled document is the same
+        # while document file and values are the same
+        etag = quote_etag(formatter.cache_key)
+        response = get_conditional_response(request, etag=etag)
+
+        if response is None:
+            try:
+                file = formatter.format_cached()
+            except RenderTimeoutError:
+                return Response(
+                    {'detail': 'Document render took too long.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
+
+            response = FileResponse(
+                file, filename=document.file.name.split('/')[-1]
+            )
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True)
+
+        return response
+
+    @action(
+        ['get'],
+        True,
+        url_path='preview/(?P<document_id>[^/.]+)',
+        permission_classes=(SelfRelatedOrIsDocumentsPackageAuthor,),
+        filterset_class=None,
+    )
+    def preview_filled_document(self, request, pk, document_id):
+        "Text and html of filled document body, .docx is not rendered."
+        _, formatter = self.__get_filled_document(request, pk, document_id)
+
+        etag = quote_etag(formatter.preview_cache_key)
+        response = get_conditional_response(request, etag=etag)
+
+        if response is None:
+            response = Response(formatter.preview())
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True)
+
+        return response
+
+    @action(
+        ['get'],
+        True,
+        url_path='download',
+        permission_classes=(SelfRelatedOrIsDocumentsPackageAuthor,),
+        filterset_class=None,
+    )
+    def download_filled_documents(self, request, pk):
+        record = get_object_or_404(
+            Record.objects.select_related('documents_package'), pk=pk
+        )
+        self.check_object_permissions(request, record)
+
+        try:
+            documents_zip, filename = get_filled_documents_zip(record)
+        except RenderTimeoutError:
+            return Response(
+                {'detail': 'Document render took too long.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        return FileResponse(
+            documents_zip,
+            as_attachment=True,
+            filename=filename
+        )
+
+    def __get_filled_document(self, request, pk, document_id):
+        "Return document of record and its formatter with record values."
         serializer = DownloadRecordDocumentSerializer(
             data={
                 'record': pk,
@@ -249,14 +570,49 @@ class RecordsViewSet(ListCreateViewSet):
             pk=document_id
         )
 
-        templates_values = record.templates_values.all()
+        templates_values = record.templates_values.select_related(
+            'template'
+        )
+
+        return document, DocumentsFormatter(
+            document.file.path, templates_values
+        )
 
-        formatted_document = DocumentsFormatter(
-            document.file.path,
-            templates_values
-        ).format()
+
+class JobViewSet(viewsets.mixins.RetrieveModelMixin, ListCreateViewSet):
+    """
+    Background jobs for heavy renders and exports.
+    Jobs are run by 'run_workers' command.
+    """
+    permission_classes = (IsAuthenticated, SelfRelated,)
+    http_method_names = HTTP_METHOD_NAMES_WITHOUT_PUT
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return GetJobSerializer
+
+        return CreateJobSerializer
+
+    def get_queryset(self):
+        # To avoid mistakes during schema generation
+        if not self.request.user.is_anonymous:
+            return Job.objects.filter(user=self.request.user)
+
+    @action(['get'], True)
+    def download(self, request, pk=None):
+        job = self.get_object()
+
+        if job.status != Job.DONE:
+            return Response(
+                {'detail': f'Job is {job.status}.'},
+                status=status.HTTP_409_CONFLICT
+            )
 
         return FileResponse(
-            formatted_document,
-            filename=document.file.name.split('/')[-1]
+            job.result.open('rb'),
+            as_attachment=True,
+            filename=job.result.name.split('/')[-1]
         )
@@ -1,2 +1,10 @@
+from .batch_render import render_batch
 from .documents_formatter import DocumentsFormatter
-from .excel_formatter import ExcelFormatter
+from .documents_plan import DocumentPlan
+from .excel_formatter import ExcelFormatter, make_excel_workbook
+from .normalizer import normalize_document
+from .records_formatter import RecordsFormatter
+from .render_pool import RenderTimeoutError, render_pool
+from .rendered_cache import rendered_documents_cache
+from .templates_cache import templates_cache
+from .zip_stream import ZipStream, render_in_parallel
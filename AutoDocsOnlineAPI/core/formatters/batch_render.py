@@ -0,0 +1,41 @@
+import os
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+
+from .documents_plan import DocumentPlan
+from .engines import ENGINES
+
+
+def render_batch(
+    template,
+    values: Iterable[dict],
+    *,
+    plan: Optional[DocumentPlan] = None,
+    engine: Optional[str] = None,
+) -> Iterator[SpooledTemporaryFile]:
+    """
+    Render one template with many value sets, without models.
+    Template is bytes, path or opened binary file of .docx document,
+    values are {name_in_document: value} dicts. Template is parsed once,
+    documents are rendered lazily while values are iterated.
+    Plan is compiled from template if it is not given.
+    """
+    engine = ENGINES[engine or settings.DOCUMENTS_FORMATTER_ENGINE]
+
+    if isinstance(template, bytes):
+        template = BytesIO(template)
+
+    if plan is None:
+        if isinstance(template, (str, os.PathLike)):
+            with open(template, 'rb') as file:
+                plan = DocumentPlan.compile_file(file)
+        else:
+            plan = DocumentPlan.compile_file(template)
+
+    parsed_template = engine(template, plan)
+
+    for data in values:
+        yield parsed_template.render(data)
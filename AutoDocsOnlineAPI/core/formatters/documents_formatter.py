@@ -1,86 +1,78 @@
-from docx import Document
-from io import BytesIO
+import json
+from hashlib import sha256
+from tempfile import SpooledTemporaryFile
 
-# thanks
-# https://github.com/ivanbicalho/python-docx-replace/blob/main/src/python_docx_replace/key_changer.py
-class KeyChanger:
-    def __init__(self, p, key, value) -> None:
-        self.p = p
-        self.key = key
-        self.value = value
-        self.run_text = ""
-        self.runs_indexes = []
-        self.run_char_indexes = []
-        self.runs_to_change = {}
+from django.conf import settings
 
-    def _initialize(self) -> None:
-        run_index = 0
-        for run in self.p.runs:
-            self.run_text += run.text
-            self.runs_indexes += [run_index for _ in run.text]
-            self.run_char_indexes += [char_index for char_index, char in enumerate(run.text)]
-            run_index += 1
-
-    def replace(self) -> None:
-        self._initialize()
-        parsed_key_length = len(self.key)
-        index_to_replace = self.run_text.find(self.key)
-
-        for i in range(parsed_key_length):
-            index = index_to_replace + i
-            run_index = self.runs_indexes[index]
-            run = self.p.runs[run_index]
-            run_char_index = self.run_char_indexes[index]
-
-            if not self.runs_to_change.get(run_index):
-                self.runs_to_change[run_index] = [char for char_index, char in enumerate(run.text)]
-
-            run_to_change = self.runs_to_change.get(run_index)  # type: ignore[assignment]
-            if index == index_to_replace:
-                run_to_change[run_char_index] = self.value
-            else:
-                run_to_change[run_char_index] = ""
-
-        # make the real replace
-        for index, text in self.runs_to_change.items():
-            run = self.p.runs[index]
-            run.text = "".join(text)
+from .documents_plan import DocumentPlan
+from .engines import ENGINES
+from .preview import DocumentPreview
+from .render_pool import render_pool
+from .rendered_cache import rendered_documents_cache
+from .templates_cache import templates_cache
 
 
 class DocumentsFormatter:
-    def __init__(self, path, templates_values):
-        self.document = Document(path)
+    """
+    Fill document placeholders by templates values.
+    Engine is name of rendering engine from ENGINES:
+    'docx' - python-docx object model, 'xml' - raw xml parts rewriting.
+    Documents are rendered by render pool processes with their own
+    templates caches, rendered documents can be taken from rendered
+    documents cache.
+    """
+
+    def __init__(self, path, templates_values, *, engine: str = None):
+        engine = engine or settings.DOCUMENTS_FORMATTER_ENGINE
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown documents formatter engine: {engine}')
+
+        self.path = path
+        self.engine = ENGINES[engine]
+        self.plan = DocumentPlan.ensure(path)
         self.data = self.__get_primitive_templates_values(
             templates_values
         )
 
-    def format(self) -> BytesIO:
-        for p in self.all_paragraphs:
-            for key, val in self.data.items():
-                while key in p.text:
-                    KeyChanger(p, key, val).replace()
+    @property
+    def cache_key(self) -> str:
+        "Hash of document file, engine and values."
+        key = json.dumps(
+            [
+                self.plan.source['sha256'],
+                self.engine.name,
+                sorted(self.data.items()),
+            ],
+            ensure_ascii=False,
+        )
+        return sha256(key.encode()).hexdigest()
 
-        file_stream = BytesIO()
-        self.document.save(file_stream)
+    @property
+    def preview_cache_key(self) -> str:
+        "Hash of document file and values, preview does not use engine."
+        key = json.dumps(
+            [self.plan.source['sha256'], sorted(self.data.items())],
+            ensure_ascii=False,
+        )
+        return sha256(key.encode()).hexdigest()
+
+    def format(self) -> SpooledTemporaryFile:
+        return render_pool.render(self.path, self.engine.name, self.data)
 
-        file_stream.seek(0)
+    def format_cached(self):
+        "Return opened rendered document file from rendered documents cache."
+        # extension lets FileResponse guess content type by file name
+        return rendered_documents_cache.get_or_render(
+            self.cache_key + '.docx', self.format
+        )
 
-        return file_stream
+    def preview(self) -> dict:
+        "Return text and html of filled document without rendering .docx."
+        preview = templates_cache.get(self.path, DocumentPreview, self.plan)
+        return preview.render(self.data)
 
     def __get_primitive_templates_values(self, templates_values):
         res = {}
         for tv in templates_values:
             res[tv.template.name_in_document] = tv.value
         return res
-
-    @property
-    def all_paragraphs(self):
-        all_paragraphs = list(self.document.paragraphs)
-        for t in self.document.tables:
-            for row in t.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        all_paragraphs.append(paragraph)
-
-        return all_paragraphs
-
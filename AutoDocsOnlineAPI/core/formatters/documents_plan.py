@@ -0,0 +1,210 @@
+import json
+import os
+import re
+import tempfile
+from hashlib import sha256
+from typing import BinaryIO, Iterable, Optional
+from zipfile import ZipFile
+
+from django.conf import settings
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+from .docx_parts import iter_zip_parts
+from .key_changer import KeyChanger
+
+
+PLAN_VERSION = 2
+
+PLACEHOLDER_REGEX = re.compile(
+    re.escape(settings.TEMPLATE_NAME_IN_DOCUMENT_PREFIX)
+    + r'[a-zA-Z-_]+'
+    + re.escape(settings.TEMPLATE_NAME_IN_DOCUMENT_POSTFIX)
+)
+
+# python-docx turns them into 'w:tab' and 'w:br' elements
+SPECIAL_CHARS = re.compile(r'[\t\n\r]')
+
+RUN_TAG = qn('w:r')
+RUN_PROPERTIES_TAG = qn('w:rPr')
+TEXT_TAG = qn('w:t')
+XML_SPACE = qn('xml:space')
+
+
+def plan_path(path: str) -> str:
+    "Return path of the plan stored next to the document file."
+    return path + settings.DOCUMENT_PLAN_SUFFIX
+
+
+def file_signature(path: str) -> dict:
+    "Cheap signature used to check that plan still matches the file."
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class DocumentPlan:
+    """
+    Precompiled positions of placeholders in .docx document.
+
+    For every part of document (body, headers, footers, footnotes
+    and endnotes) plan contains list of
+    (paragraph index, placeholders) pairs, where paragraph index is
+    index of 'w:p' element in part in document order and every placeholder
+    is [key, start run, start offset, end run, end offset].
+    """
+
+    def __init__(self, parts: dict, source: dict):
+        self.parts = parts
+        self.source = source
+
+    @classmethod
+    def compile(cls, parts: Iterable, source: dict) -> 'DocumentPlan':
+        "Find all placeholders in (partname, element) parts of document."
+        res = {}
+
+        for partname, element in parts:
+            paragraphs = []
+
+            for index, p in enumerate(element.iter(qn('w:p'))):
+                placeholders = KeyChanger(
+                    Paragraph(p, None), PLACEHOLDER_REGEX
+                ).find()
+                if placeholders:
+                    paragraphs.append([index, placeholders])
+
+            if paragraphs:
+                res[partname] = paragraphs
+
+        return cls(res, source)
+
+    @classmethod
+    def compile_file(cls, file: BinaryIO) -> 'DocumentPlan':
+        "Compile plan of opened .docx file, which can be not stored on disk."
+        file.seek(0)
+        checksum = sha256(file.read()).hexdigest()
+
+        with ZipFile(file) as zip_file:
+            return cls.compile(
+                iter_zip_parts(zip_file), {'sha256': checksum}
+            )
+
+    @classmethod
+    def load(cls, path: str) -> Optional['DocumentPlan']:
+        "Return plan of document or None if it missing or outdated."
+        try:
+            with open(plan_path(path)) as file:
+                data = json.load(file)
+            signature = file_signature(path)
+        except (OSError, ValueError):
+            return None
+
+        source = data.get('source', {})
+        if (
+            data.get('version') != PLAN_VERSION
+            or source.get('size') != signature['size']
+            or source.get('mtime_ns') != signature['mtime_ns']
+        ):
+            return None
+
+        return cls(data['parts'], source)
+
+    @classmethod
+    def ensure(cls, path: str) -> 'DocumentPlan':
+        "Load plan of document, compile and save it if necessary."
+        plan = cls.load(path)
+
+        if plan is None:
+            with open(path, 'rb') as file:
+                plan = cls.compile_file(file)
+            plan.source |= file_signature(path)
+
+            try:
+                plan.save(path)
+            except OSError:
+                # plan is only optimization, render without saving it
+                pass
+
+        return plan
+
+    def save(self, path: str) -> None:
+        data = {
+            'version': PLAN_VERSION,
+            'source': self.source,
+            'parts': self.parts,
+        }
+        directory, name = os.path.split(plan_path(path))
+
+        # plans of the same document are saved by different processes
+        tmp = tempfile.NamedTemporaryFile(
+            'w', dir=directory or '.', prefix=f'.{name}', delete=False
+        )
+        try:
+            with tmp:
+                json.dump(data, tmp, separators=(',', ':'))
+
+            os.replace(tmp.name, plan_path(path))
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+    @property
+    def keys(self) -> set[str]:
+        return {
+            placeholder[0]
+            for paragraphs in self.parts.values()
+            for _, placeholders in paragraphs
+            for placeholder in placeholders
+        }
+
+    def apply(self, parts: Iterable, data: dict) -> None:
+        "Replace placeholders in (partname, element) parts by data values."
+        for partname, element in parts:
+            paragraphs = self.parts.get(partname)
+            if not paragraphs:
+                continue
+
+            elements = list(element.iter(qn('w:p')))
+            for index, placeholders in paragraphs:
+                p = elements[index]
+
+                # normalized documents have every placeholder in one run
+                if not _replace_in_single_runs(p, data, placeholders):
+                    KeyChanger(Paragraph(p, None)).replace(data, placeholders)
+
+
+def _replace_in_single_runs(p, data: dict, placeholders: list) -> bool:
+    """
+    Replace placeholders directly in 'w:t' of runs which contain only text.
+    Return False without changes if some placeholder needs KeyChanger.
+    """
+    runs = p.findall(RUN_TAG)
+    texts = {}
+
+    for key, start_run, _, end_run, _ in placeholders:
+        if key not in data:
+            continue
+
+        value = data[key]
+        if start_run != end_run or SPECIAL_CHARS.search(value):
+            return False
+
+        if start_run not in texts:
+            children = [
+                child for child in runs[start_run]
+                if child.tag != RUN_PROPERTIES_TAG
+            ]
+            if len(children) != 1 or children[0].tag != TEXT_TAG:
+                return False
+
+            texts[start_run] = children[0]
+
+    # from the end, so offsets of previous keys stay valid
+    for key, index, start, _, end in reversed(placeholders):
+        if key not in data:
+            continue
+
+        t = texts[index]
+        t.text = t.text[:start] + data[key] + t.text[end:]
+        t.set(XML_SPACE, 'preserve')
+
+    return True
@@ -0,0 +1,86 @@
+from zipfile import ZipFile
+
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.oxml import serialize_part_xml
+from docx.opc.part import XmlPart
+from docx.oxml import oxml_parser, parse_xml
+from lxml import etree
+
+
+CONTENT_TYPES_MEMBER = '[Content_Types].xml'
+CONTENT_TYPES_OVERRIDE_TAG = (
+    '{http://schemas.openxmlformats.org/package/2006/content-types}Override'
+)
+
+# parts which can contain placeholders
+PLACEHOLDERS_CONTENT_TYPES = {
+    CT.WML_DOCUMENT_MAIN,
+    CT.WML_HEADER,
+    CT.WML_FOOTER,
+    CT.WML_FOOTNOTES,
+    CT.WML_ENDNOTES,
+}
+
+
+class DocxParts:
+    """
+    Parts of document opened by python-docx which can contain placeholders.
+    Parts unknown for python-docx are stored as blob, so they are parsed
+    here and written back by 'commit'.
+    """
+
+    def __init__(self, document):
+        self.parts = [
+            part for part in document.part.package.iter_parts()
+            if part.content_type in PLACEHOLDERS_CONTENT_TYPES
+        ]
+        self.elements = {}
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, XmlPart):
+                yield str(part.partname), part.element
+                continue
+
+            element = parse_xml(part.blob)
+            self.elements[part] = element
+            yield str(part.partname), element
+
+    def commit(self) -> None:
+        for part, element in self.elements.items():
+            part._blob = serialize_part_xml(element)
+
+
+def get_zip_members(
+    zip_file: ZipFile, content_types: set = PLACEHOLDERS_CONTENT_TYPES
+) -> dict:
+    "Return {partname: zip member name} of parts with given content types."
+    members = {
+        name.lower(): name for name in zip_file.namelist()
+    }
+    types = etree.fromstring(zip_file.read(CONTENT_TYPES_MEMBER))
+
+    res = {}
+    for override in types.iter(CONTENT_TYPES_OVERRIDE_TAG):
+        partname = override.get('PartName')
+        name = members.get(partname.lstrip('/').lower())
+
+        if (
+            name is not None
+            and override.get('ContentType') in content_types
+        ):
+            res[partname] = name
+
+    return res
+
+
+def parse_zip_member(zip_file: ZipFile, name: str):
+    "Parse xml member of archive as python-docx oxml element."
+    with zip_file.open(name) as file:
+        return etree.parse(file, oxml_parser).getroot()
+
+
+def iter_zip_parts(zip_file: ZipFile):
+    "Yield (partname, element) of parts which can contain placeholders."
+    for partname, name in get_zip_members(zip_file).items():
+        yield partname, parse_zip_member(zip_file, name)
@@ -0,0 +1,111 @@
+from copy import deepcopy
+from tempfile import SpooledTemporaryFile
+from zipfile import ZipFile
+
+from docx import Document
+from docx.opc.oxml import serialize_part_xml
+
+from core.utils import make_spooled_file
+
+from .docx_parts import DocxParts, get_zip_members, parse_zip_member
+from .documents_plan import DocumentPlan
+from .raw_zip import RawZipWriter, open_archive, read_raw_member
+
+
+class DocxEngine:
+    """
+    Parsed template which is rendered through python-docx object model.
+    Template is path or opened binary file of .docx document.
+    Every render works with deep copy of parsed document.
+    """
+
+    name = 'docx'
+
+    def __init__(self, template, plan: DocumentPlan):
+        self.plan = plan
+        self.document = Document(template)
+        self.size = _get_size(template)
+
+    def render(self, data: dict) -> SpooledTemporaryFile:
+        document = deepcopy(self.document)
+
+        parts = DocxParts(document)
+        self.plan.apply(parts, data)
+        parts.commit()
+
+        file_stream = make_spooled_file()
+        document.save(file_stream)
+        file_stream.seek(0)
+
+        return file_stream
+
+
+class XmlEngine:
+    """
+    Parsed template which is rendered by rewriting only xml parts
+    with placeholders. All other members of archive (images, styles, etc.)
+    are kept as compressed bytes and copied without decompressing.
+    Template is path or opened binary file of .docx document.
+    It is not streaming: xml parts are parsed whole once, when template
+    is loaded, and every render works with deep copy of them.
+    """
+
+    name = 'xml'
+
+    def __init__(self, template, plan: DocumentPlan):
+        self.plan = plan
+        self.members = []
+        self.size = 0
+
+        with open_archive(template) as file, ZipFile(file) as source:
+            parts = {
+                name: partname
+                for partname, name in get_zip_members(source).items()
+                if partname in plan.parts
+            }
+
+            for info in source.infolist():
+                partname = parts.get(info.filename)
+
+                if partname is None:
+                    data = read_raw_member(file, info)
+                    self.size += info.compress_size
+                else:
+                    data = (partname, parse_zip_member(source, info.filename))
+                    self.size += info.file_size
+
+                self.members.append((info, data))
+
+    def render(self, data: dict) -> SpooledTemporaryFile:
+        file_stream = make_spooled_file()
+
+        with RawZipWriter(file_stream) as target:
+            for info, member in self.members:
+                if isinstance(member, bytes):
+                    target.write_raw(info, member)
+                    continue
+
+                partname, element = member
+                element = deepcopy(element)
+                self.plan.apply([(partname, element)], data)
+
+                target.write_deflated(
+                    info.filename, info.date_time, serialize_part_xml(element)
+                )
+
+        file_stream.seek(0)
+
+        return file_stream
+
+
+def _get_size(template) -> int:
+    "Approximate memory size of parsed template: archive and parsed xml."
+    with ZipFile(template) as zip_file:
+        return sum(
+            info.file_size if info.filename.endswith(('.xml', '.rels'))
+            else info.compress_size
+            for info in zip_file.infolist()
+        )
+
+
+ENGINES = {engine.name: engine for engine in (DocxEngine, XmlEngine)}
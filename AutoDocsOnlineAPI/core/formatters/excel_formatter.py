@@ -1,9 +1,14 @@
+import re
 from datetime import datetime
-from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from typing import Iterable
 
 import openpyxl
 from django.conf import settings
-from openpyxl.styles import Font
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.styles import Font, NamedStyle
+
+from core.utils import make_spooled_file
 
 
 FILLING_DATE_COLUMN_NAME = 'Дата заполнения'
@@ -18,61 +23,143 @@ ROW_CELL_FONT = Font(
     size=12,
     color='FF000000'
 )
+COL_CELL_STYLE = 'Column cell'
+ROW_CELL_STYLE = 'Row cell'
+
+SHEET_TITLE_MAX_LENGTH = 31
+SHEET_TITLE_INVALID_CHARS = re.compile(r'[\\/*?:\[\]]')
+
+
+def _make_workbook(write_only: bool) -> openpyxl.Workbook:
+    "Return empty workbook with styles of cells."
+    wb = openpyxl.Workbook(write_only=write_only)
+    # cells refer to shared styles instead of own fonts
+    wb.add_named_style(NamedStyle(COL_CELL_STYLE, font=COL_CELL_FONT))
+    wb.add_named_style(NamedStyle(ROW_CELL_STYLE, font=ROW_CELL_FONT))
+
+    if not write_only:
+        wb.remove(wb.active)
+
+    return wb
+
+
+def _save_workbook(wb: openpyxl.Workbook) -> SpooledTemporaryFile:
+    file_stream = make_spooled_file()
+    wb.save(file_stream)
+    file_stream.seek(0)
+
+    return file_stream
+
+
+def make_excel_workbook(
+    formatters: Iterable['ExcelFormatter'], *, write_only: bool = None
+) -> SpooledTemporaryFile:
+    """
+    Return opened file of workbook with sheet of every formatter, sheets
+    are named by titles of formatters.
+    Formatters are taken while sheets are filled, so rows of next sheets
+    can be prepared meanwhile.
+    """
+    if write_only is None:
+        write_only = settings.EXCEL_FORMATTER_WRITE_ONLY
+
+    wb = _make_workbook(write_only)
+    titles = set()
+
+    for formatter in formatters:
+        # titles of sheets are case insensitive unique
+        base = SHEET_TITLE_INVALID_CHARS.sub('', formatter.title or 'Sheet')
+        title = base[:SHEET_TITLE_MAX_LENGTH]
+        index = 1
+        while title.lower() in titles:
+            index += 1
+            suffix = f' ({index})'
+            title = base[:SHEET_TITLE_MAX_LENGTH - len(suffix)] + suffix
+
+        titles.add(title.lower())
+
+        formatter.write_only = write_only
+        formatter.fill_sheet(wb.create_sheet(title))
+
+    return _save_workbook(wb)
 
 
 class ExcelFormatter:
-    def __init__(self, records, templates, *, title: str = None):
-        self.records = records
+    """
+    Excel summary of records.
+    Rows are (creation date, {template id: value}) of records,
+    templates are columns.
+    Write only workbook streams rows to temporary file, so memory does
+    not grow with number of rows, normal workbook keeps all cells.
+    """
+
+    def __init__(
+        self,
+        rows,
+        templates,
+        *,
+        title: str = None,
+        write_only: bool = None,
+    ):
+        self.rows = rows
+        self.title = title
         self.templates = self.__get_simple_templates(templates)
         self.filename = (
             (title or 'document')
             + datetime.now().strftime(settings.EXCEL_FORMATTER_TITLE_STRFTIME)
         )
+        self.write_only = (
+            settings.EXCEL_FORMATTER_WRITE_ONLY
+            if write_only is None else write_only
+        )
 
-    def make_excel_data_summary(self) -> tuple[BytesIO, str]:
-        "Return file content as bytes and filename."
+    def make_excel_data_summary(self) -> tuple[SpooledTemporaryFile, str]:
+        "Return opened file and filename."
+        wb = _make_workbook(self.write_only)
+        self.fill_sheet(wb.create_sheet())
 
-        wb = openpyxl.Workbook()
-        self.sheet = wb.active
+        return _save_workbook(wb), self.filename
 
+    def fill_sheet(self, sheet) -> None:
+        "Fill sheet of workbook with columns and rows."
+        self.sheet = sheet
         self.__fill_columns()
         self.__fill_data()
 
-        file_stream = BytesIO()
-        wb.save(file_stream)
-        file_stream.seek(0)
-
-        return file_stream, self.filename
-
     def __fill_columns(self):
         columns = list(self.templates.values()) + [FILLING_DATE_COLUMN_NAME]
 
-        for col_num, col_name in enumerate(columns, 1):
-            cell = self.sheet.cell(row=1, column=col_num)
-            cell.value = col_name
-            self.__set_col_cell_style(cell)
+        self.sheet.append([
+            self.__make_cell(col_name, COL_CELL_STYLE)
+            for col_name in columns
+        ])
 
     def __fill_data(self):
-        for row_num, record, in enumerate(self.records, 2):
-            for col_num, template_pk in enumerate(self.templates.keys(), 1):
-                cell = self.sheet.cell(row=row_num, column=col_num)
-                cell.value = record.templates_values.get(
-                    template__id=template_pk
-                ).value
-                self.__set_row_cell_style(cell)
+        for creation_date, values in self.rows:
+            row = [
+                self.__make_cell(values.get(template_pk), ROW_CELL_STYLE)
+                for template_pk in self.templates.keys()
+            ]
 
             # add creation date
-            cell = self.sheet.cell(row=row_num, column=col_num + 1)
-            cell.value = record.creation_date.strftime(
-                settings.EXCEL_FORMATTER_DATE_CREATION_COL_STRFTIME
-            )
-            self.__set_row_cell_style(cell)
+            row.append(self.__make_cell(
+                creation_date.strftime(
+                    settings.EXCEL_FORMATTER_DATE_CREATION_COL_STRFTIME
+                ),
+                ROW_CELL_STYLE,
+            ))
+
+            self.sheet.append(row)
+
+    def __make_cell(self, value, style: str):
+        if self.write_only:
+            cell = WriteOnlyCell(self.sheet, value)
+        else:
+            cell = Cell(self.sheet, value=value)
 
-    def __set_col_cell_style(self, cell):
-        cell.font = COL_CELL_FONT
+        cell.style = style
 
-    def __set_row_cell_style(self, cell):
-        cell.font = ROW_CELL_FONT
+        return cell
 
     def __get_simple_templates(self, templates):
         res = {}
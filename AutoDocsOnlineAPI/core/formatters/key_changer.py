@@ -0,0 +1,71 @@
+import re
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Optional
+
+
+# thanks
+# https://github.com/ivanbicalho/python-docx-replace/blob/main/src/python_docx_replace/key_changer.py
+class KeyChanger:
+    """
+    Find and replace keys in paragraph, even if key is split into runs.
+
+    All keys are found in one pass by matcher, text offsets are mapped to
+    runs by bisect over cumulative lengths of runs.
+    Every found key is [key, start run, start offset, end run, end offset].
+    """
+
+    def __init__(self, p, matcher: Optional[re.Pattern] = None) -> None:
+        self.p = p
+        self.matcher = matcher
+        self.runs = p.runs
+
+    def find(self) -> list:
+        runs_texts = [run.text for run in self.runs]
+        runs_ends = list(accumulate(map(len, runs_texts)))
+        text = ''.join(runs_texts)
+
+        keys = []
+        for match in self.matcher.finditer(text):
+            start_run, start = self.__locate(runs_ends, match.start())
+            end_run, end = self.__locate(runs_ends, match.end() - 1)
+            keys.append([match.group(), start_run, start, end_run, end + 1])
+
+        return keys
+
+    def replace(self, data: dict, keys: Optional[list] = None) -> None:
+        "Replace found or given keys by values from data."
+        if keys is None:
+            keys = self.find()
+
+        texts = {}
+
+        # from the end, so offsets of previous keys stay valid
+        for key, start_run, start, end_run, end in reversed(keys):
+            if key not in data:
+                continue
+
+            for index in range(start_run, end_run + 1):
+                if index not in texts:
+                    texts[index] = self.runs[index].text
+
+            if start_run == end_run:
+                text = texts[start_run]
+                texts[start_run] = text[:start] + data[key] + text[end:]
+                continue
+
+            texts[start_run] = texts[start_run][:start] + data[key]
+            for index in range(start_run + 1, end_run):
+                texts[index] = ''
+            texts[end_run] = texts[end_run][end:]
+
+        # make the real replace
+        for index, text in texts.items():
+            self.runs[index].text = text
+
+    @staticmethod
+    def __locate(runs_ends: list, offset: int) -> tuple[int, int]:
+        run_index = bisect_right(runs_ends, offset)
+        run_start = runs_ends[run_index - 1] if run_index else 0
+
+        return run_index, offset - run_start
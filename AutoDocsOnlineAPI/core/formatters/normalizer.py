@@ -0,0 +1,124 @@
+from io import BytesIO
+from typing import BinaryIO
+from zipfile import ZipFile
+
+from docx.opc.oxml import serialize_part_xml
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from .docx_parts import get_zip_members, parse_zip_member
+from .documents_plan import (
+    PLACEHOLDER_REGEX,
+    RUN_PROPERTIES_TAG,
+    RUN_TAG,
+    TEXT_TAG,
+    XML_SPACE,
+)
+from .key_changer import KeyChanger
+from .raw_zip import RawZipWriter, read_raw_member
+
+
+# proofing and layout marks, which only split runs
+REMOVED_TAGS = (qn('w:proofErr'), qn('w:lastRenderedPageBreak'))
+
+
+def normalize_document(file: BinaryIO) -> tuple[BytesIO, set[str]]:
+    """
+    Return .docx document with merged runs and not split placeholders
+    and names of all placeholders found in it.
+    Adjacent runs with identical formatting are merged and every
+    placeholder is collapsed into its first run, so placeholders are
+    replaced by the single run fast path on render.
+    """
+    file_stream = BytesIO()
+    keys = set()
+
+    with ZipFile(file) as source, RawZipWriter(file_stream) as target:
+        parts = {
+            name: partname
+            for partname, name in get_zip_members(source).items()
+        }
+
+        for info in source.infolist():
+            if info.filename not in parts:
+                target.write_raw(info, read_raw_member(file, info))
+                continue
+
+            element = parse_zip_member(source, info.filename)
+            for p in element.iter(qn('w:p')):
+                keys.update(normalize_paragraph(p))
+
+            target.write_deflated(
+                info.filename, info.date_time, serialize_part_xml(element)
+            )
+
+    file_stream.seek(0)
+
+    return file_stream, keys
+
+
+def normalize_paragraph(p) -> set[str]:
+    "Normalize runs of paragraph and return names of its placeholders."
+    for element in list(p.iter(*REMOVED_TAGS)):
+        element.getparent().remove(element)
+
+    _merge_runs(p)
+
+    changer = KeyChanger(Paragraph(p, None), PLACEHOLDER_REGEX)
+    keys = changer.find()
+    names = {key[0] for key in keys}
+
+    split_keys = [key for key in keys if key[1] != key[3]]
+    if not split_keys:
+        return names
+
+    # the whole key is written to start run, the rest of runs are cut
+    changer.replace({key[0]: key[0] for key in split_keys}, split_keys)
+
+    for r in p.findall(RUN_TAG):
+        if all(child.tag == RUN_PROPERTIES_TAG for child in r):
+            p.remove(r)
+
+    return names
+
+
+def _merge_runs(p) -> None:
+    previous, previous_text = None, None
+
+    for r in p.findall(RUN_TAG):
+        text = _get_text_element(r)
+        mergeable = (
+            previous is not None
+            and text is not None
+            and r.getprevious() is previous
+            and _get_properties(r) == _get_properties(previous)
+        )
+
+        if mergeable:
+            previous_text.text = (previous_text.text or '') + (text.text or '')
+            previous_text.set(XML_SPACE, 'preserve')
+            p.remove(r)
+            continue
+
+        previous, previous_text = r, text
+        if text is None:
+            previous = None
+
+
+def _get_text_element(r):
+    "Return the only 'w:t' of run or None if run has other content."
+    children = [child for child in r if child.tag != RUN_PROPERTIES_TAG]
+
+    if len(children) == 1 and children[0].tag == TEXT_TAG:
+        return children[0]
+
+    return None
+
+
+def _get_properties(r) -> bytes:
+    properties = r.find(RUN_PROPERTIES_TAG)
+    if properties is None:
+        return b''
+
+    return etree.tostring(properties, method='c14n')
@@ -0,0 +1,129 @@
+from html import escape
+from zipfile import ZipFile
+
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+from .docx_parts import get_zip_members, parse_zip_member
+from .documents_plan import PLACEHOLDER_REGEX, DocumentPlan
+
+
+PARAGRAPH_TAG = qn('w:p')
+TABLE_TAG = qn('w:tbl')
+ROW_TAG = qn('w:tr')
+CELL_TAG = qn('w:tc')
+GRID_SPAN_TAG = qn('w:gridSpan')
+# block content controls and custom xml contain paragraphs and tables
+SDT_TAG = qn('w:sdt')
+SDT_CONTENT_TAG = qn('w:sdtContent')
+CUSTOM_XML_TAG = qn('w:customXml')
+
+# text of other blocks with paragraphs, which are not projected
+OMITTED_CONTENT = '[content omitted]'
+
+
+class DocumentPreview:
+    """
+    Text and html projections of body of .docx template (paragraphs and
+    tables, also nested in cells and content controls) with placeholders,
+    so filled document can be previewed by substitution of values
+    without rendering .docx. Other blocks with paragraphs are shown as
+    omitted content.
+    Has interface of engines, so it is cached by templates cache.
+    """
+
+    name = 'preview'
+
+    def __init__(self, template, plan: DocumentPlan):
+        self.plan = plan
+        text_lines = []
+        html_blocks = []
+
+        with ZipFile(template) as zip_file:
+            [name] = get_zip_members(
+                zip_file, {CT.WML_DOCUMENT_MAIN}
+            ).values()
+            body = parse_zip_member(zip_file, name).find(qn('w:body'))
+
+        for text, html in self.__project_blocks(body):
+            text_lines.append(text)
+            html_blocks.append(html)
+
+        self.text = '\n'.join(text_lines)
+        self.html = '\n'.join(html_blocks)
+        self.size = len(self.text) + len(self.html)
+
+    def render(self, data: dict) -> dict:
+        "Return text and html of filled document."
+        return {
+            'text': PLACEHOLDER_REGEX.sub(
+                lambda match: data.get(match.group(), match.group()),
+                self.text,
+            ),
+            'html': PLACEHOLDER_REGEX.sub(
+                lambda match: escape(data.get(match.group(), match.group())),
+                self.html,
+            ),
+        }
+
+    def __project_blocks(self, parent) -> list[tuple[str, str]]:
+        "Text and html of blocks of body, cell or content control."
+        blocks = []
+
+        for element in parent:
+            if element.tag == PARAGRAPH_TAG:
+                blocks.append(self.__project_paragraph(element))
+            elif element.tag == TABLE_TAG:
+                blocks.append(self.__project_table(element))
+            elif element.tag == SDT_TAG:
+                content = element.find(SDT_CONTENT_TAG)
+                if content is not None:
+                    blocks.extend(self.__project_blocks(content))
+            elif element.tag == CUSTOM_XML_TAG:
+                blocks.extend(self.__project_blocks(element))
+            elif next(element.iter(PARAGRAPH_TAG), None) is not None:
+                blocks.append((
+                    OMITTED_CONTENT,
+                    f'<p>{self.__to_html(OMITTED_CONTENT)}</p>',
+                ))
+
+        return blocks
+
+    def __project_paragraph(self, p) -> tuple[str, str]:
+        text = Paragraph(p, None).text
+
+        return text, f'<p>{self.__to_html(text)}</p>'
+
+    def __project_table(self, tbl) -> tuple[str, str]:
+        lines = []
+        rows = []
+
+        for tr in tbl.iterchildren(ROW_TAG):
+            cells = []
+            texts = []
+
+            for tc in tr.iterchildren(CELL_TAG):
+                blocks = self.__project_blocks(tc)
+                span = tc.find(f'{qn("w:tcPr")}/{GRID_SPAN_TAG}')
+                colspan = (
+                    f' colspan="{span.get(qn("w:val"))}"'
+                    if span is not None else ''
+                )
+
+                texts.append(
+                    ' '.join(text for text, _ in blocks).replace('\n', ' ')
+                )
+                cells.append(
+                    f'<td{colspan}>{"".join(html for _, html in blocks)}</td>'
+                )
+
+            lines.append('\t'.join(texts))
+            rows.append(f'<tr>{"".join(cells)}</tr>')
+
+        return '\n'.join(lines), f'<table>{"".join(rows)}</table>'
+
+    @staticmethod
+    def __to_html(text: str) -> str:
+        # placeholders have not escaped characters, so they are kept
+        return escape(text).replace('\t', '&emsp;').replace('\n', '<br>')
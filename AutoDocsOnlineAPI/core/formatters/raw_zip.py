@@ -0,0 +1,173 @@
+import os
+import struct
+import zipfile
+import zlib
+from contextlib import nullcontext
+from zipfile import ZipInfo
+
+
+# records of zip format (APPNOTE.TXT), sizes and offsets are 32 bit
+LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+END_OF_CENTRAL_DIRECTORY = struct.Struct('<4s4H2LH')
+
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+CENTRAL_HEADER_SIGNATURE = b'PK\x01\x02'
+END_OF_CENTRAL_DIRECTORY_SIGNATURE = b'PK\x05\x06'
+
+# flag bits of data descriptor and of utf-8 names
+DATA_DESCRIPTOR_FLAG = 0x08
+UTF8_FLAG = 0x800
+# version 2.0 is needed to extract deflated members
+EXTRACT_VERSION = 20
+MAX_32_BIT = 0xFFFFFFFF
+MAX_16_BIT = 0xFFFF
+
+
+def open_archive(archive):
+    "Opened binary file of path, opened file of archive is kept open."
+    if isinstance(archive, (str, os.PathLike)):
+        return open(archive, 'rb')
+
+    return nullcontext(archive)
+
+
+def read_raw_member(file, info: ZipInfo) -> bytes:
+    """
+    Return compressed bytes of member of archive without decompressing.
+    File is binary file of archive, info is its member from infolist.
+    """
+    file.seek(info.header_offset)
+    header = LOCAL_HEADER.unpack(file.read(LOCAL_HEADER.size))
+    if header[0] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f'Bad local header of {info.filename}')
+
+    # name and extra field of local header differ from central directory
+    name_length, extra_length = header[-2:]
+    file.seek(name_length + extra_length, 1)
+
+    return file.read(info.compress_size)
+
+
+class RawZipWriter:
+    """
+    Zip archive written to binary file, members are copied as compressed
+    bytes with their CRC and sizes, so they are not decompressed and
+    compressed again. New members are deflated.
+    Archive does not use zip64, its members and size are below 4 GB.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.offset = 0
+        self.central_directory = []
+
+    def write_raw(self, info: ZipInfo, data: bytes) -> None:
+        "Write member with compressed data read by read_raw_member."
+        # sizes are written in local header instead of data descriptor
+        flag_bits = info.flag_bits & ~DATA_DESCRIPTOR_FLAG
+        self.__write_member(info, flag_bits, info.compress_type, data)
+
+    def write_deflated(
+        self, name: str, date_time: tuple, data: bytes
+    ) -> None:
+        "Write member of data compressed by deflate."
+        info = ZipInfo(name, date_time)
+        info.CRC = zlib.crc32(data)
+        info.file_size = len(data)
+
+        compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15
+        )
+        compressed = compressor.compress(data) + compressor.flush()
+        info.compress_size = len(compressed)
+
+        self.__write_member(info, 0, zipfile.ZIP_DEFLATED, compressed)
+
+    def close(self) -> None:
+        "Write central directory, file is not closed."
+        start = self.offset
+        for record in self.central_directory:
+            self.__write(record)
+
+        if len(self.central_directory) > MAX_16_BIT:
+            raise zipfile.LargeZipFile('Too many members of archive')
+
+        self.__write(END_OF_CENTRAL_DIRECTORY.pack(
+            END_OF_CENTRAL_DIRECTORY_SIGNATURE,
+            0,
+            0,
+            len(self.central_directory),
+            len(self.central_directory),
+            self.__check_size(self.offset - start),
+            self.__check_size(start),
+            0,
+        ))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        if exc_type is None:
+            self.close()
+
+    def __write_member(
+        self, info: ZipInfo, flag_bits: int, compress_type: int, data: bytes
+    ) -> None:
+        try:
+            name = info.filename.encode('ascii')
+            flag_bits &= ~UTF8_FLAG
+        except UnicodeEncodeError:
+            name = info.filename.encode('utf-8')
+            flag_bits |= UTF8_FLAG
+
+        year, month, day, hour, minute, second = info.date_time
+        dos_time = hour << 11 | minute << 5 | second // 2
+        dos_date = (year - 1980) << 9 | month << 5 | day
+
+        fields = (
+            flag_bits,
+            compress_type,
+            dos_time,
+            dos_date,
+            info.CRC,
+            self.__check_size(info.compress_size),
+            self.__check_size(info.file_size),
+            len(name),
+        )
+        offset = self.__check_size(self.offset)
+
+        self.__write(LOCAL_HEADER.pack(
+            LOCAL_HEADER_SIGNATURE, EXTRACT_VERSION, 0, *fields, 0
+        ))
+        self.__write(name)
+        self.__write(data)
+
+        self.central_directory.append(
+            CENTRAL_HEADER.pack(
+                CENTRAL_HEADER_SIGNATURE,
+                EXTRACT_VERSION,
+                info.create_system,
+                EXTRACT_VERSION,
+                0,
+                *fields,
+                0,
+                0,
+                0,
+                info.internal_attr,
+                info.external_attr,
+                offset,
+            )
+            + name
+        )
+
+    def __write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.offset += len(data)
+
+    @staticmethod
+    def __check_size(size: int) -> int:
+        if size > MAX_32_BIT:
+            raise zipfile.LargeZipFile('Archive needs zip64 extensions')
+
+        return size
@@ -0,0 +1,89 @@
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Iterator
+
+from django.conf import settings
+
+from .excel_formatter import FILLING_DATE_COLUMN_NAME
+
+
+# lines of records sent to client at once
+LINES_PER_CHUNK = 100
+
+
+class _Echo:
+    "Pseudo buffer, csv writer returns written line."
+
+    def write(self, value: str) -> str:
+        return value
+
+
+class RecordsFormatter:
+    """
+    Records as csv or json lines with columns of ExcelFormatter.
+    Rows are (creation date, {template id: value}) of records,
+    lines are made while rows are iterated, so memory does not grow
+    with number of records.
+    Titles of templates are not unique, so values of json lines are
+    keyed by unique names in document of templates.
+    """
+
+    formats = ('csv', 'jsonl')
+
+    def __init__(self, rows, templates, *, title: str = None):
+        self.rows = rows
+        self.templates = {template.pk: template for template in templates}
+        self.columns = [
+            template.title for template in self.templates.values()
+        ] + [FILLING_DATE_COLUMN_NAME]
+        self.keys = [
+            template.name_in_document for template in self.templates.values()
+        ] + [FILLING_DATE_COLUMN_NAME]
+        self.filename = (
+            (title or 'document')
+            + datetime.now().strftime(settings.EXCEL_FORMATTER_TITLE_STRFTIME)
+        )
+
+    def format(self, export_format: str) -> Iterator[str]:
+        "Return iterator of chunks of lines in one of formats."
+        if export_format not in self.formats:
+            raise ValueError(f'Unknown records format: {export_format}')
+
+        return getattr(self, f'_{export_format}_chunks')()
+
+    def _csv_chunks(self) -> Iterator[str]:
+        writer = csv.writer(_Echo())
+
+        # header is sent before records are fetched
+        yield writer.writerow(self.columns)
+        yield from self.__join(
+            writer.writerow(row) for row in self.__iter_rows()
+        )
+
+    def _jsonl_chunks(self) -> Iterator[str]:
+        yield from self.__join(
+            json.dumps(dict(zip(self.keys, row)), ensure_ascii=False)
+            + '\n'
+            for row in self.__iter_rows()
+        )
+
+    def __iter_rows(self) -> Iterator[list]:
+        for creation_date, values in self.rows:
+            yield [
+                values.get(template_pk) for template_pk in self.templates
+            ] + [
+                creation_date.strftime(
+                    settings.EXCEL_FORMATTER_DATE_CREATION_COL_STRFTIME
+                )
+            ]
+
+    @staticmethod
+    def __join(lines: Iterator[str]) -> Iterator[str]:
+        while True:
+            chunk = ''.join(islice(lines, LINES_PER_CHUNK))
+            if not chunk:
+                return
+
+            yield chunk
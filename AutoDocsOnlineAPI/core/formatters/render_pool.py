@@ -0,0 +1,198 @@
+import multiprocessing
+import os
+import resource
+from queue import Empty, LifoQueue
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+from time import monotonic
+
+import django
+from django.conf import settings
+
+from core.utils import make_spooled_file
+
+from .engines import ENGINES
+from .templates_cache import templates_cache
+
+
+RESULT_CHUNK_SIZE = 256 * 2 ** 10
+
+
+class RenderTimeoutError(TimeoutError):
+    pass
+
+
+def _serve(connection) -> None:
+    """
+    Render documents sent by pool until connection is closed.
+    Every answer is (error, peak memory) and, if there is no error,
+    chunks of rendered document ended by empty chunk.
+    """
+    django.setup()
+
+    while True:
+        try:
+            path, engine, data = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            template = templates_cache.get(path, ENGINES[engine])
+            file_stream, error = template.render(data), None
+        except Exception as exception:
+            file_stream, error = None, exception
+
+        # ru_maxrss is in kilobytes on linux
+        memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+        try:
+            connection.send((error, memory))
+        except Exception:
+            # error can not be pickled
+            connection.send(
+                (RuntimeError(f'{type(error).__name__}: {error}'), memory)
+            )
+
+        if file_stream is None:
+            continue
+
+        with file_stream:
+            file_stream.seek(0)
+            while True:
+                chunk = file_stream.read(RESULT_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                connection.send_bytes(chunk)
+
+        connection.send_bytes(b'')
+
+
+class _Worker:
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_serve, args=(child_connection,), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.tasks = 0
+
+    def stop(self) -> None:
+        "Let worker finish, it exits when connection is closed."
+        self.connection.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class RenderPool:
+    """
+    Pool of long-lived render processes of web worker.
+    Every process keeps its own templates cache, so templates stay parsed
+    between requests, and web worker does not hold parsed templates.
+    Process is killed if render takes more than timeout seconds and
+    is replaced after max_tasks renders or when its peak memory is
+    bigger than max_memory bytes.
+    Processes are started on first use, pool of size 0 renders in
+    current process. Render fails if all processes are busy for timeout.
+    """
+
+    def __init__(
+        self, size: int, timeout: float, max_tasks: int, max_memory: int
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self.max_memory = max_memory
+        # spawned processes do not inherit threads and connections of
+        # web worker
+        self.__context = multiprocessing.get_context('spawn')
+        self.__workers = None
+        self.__pid = None
+        self.__lock = Lock()
+
+    def render(
+        self, path: str, engine: str, data: dict
+    ) -> SpooledTemporaryFile:
+        if self.size <= 0:
+            return templates_cache.get(path, ENGINES[engine]).render(data)
+
+        workers = self.__get_workers()
+        try:
+            worker = workers.get(timeout=self.timeout)
+        except Empty:
+            raise RenderTimeoutError(
+                f'No free render process for {self.timeout} s.'
+            )
+
+        try:
+            if worker is None:
+                worker = _Worker(self.__context)
+
+            worker.connection.send((path, engine, data))
+            deadline = monotonic() + self.timeout
+
+            self.__wait(worker, deadline, path)
+            error, memory = worker.connection.recv()
+
+            if error is None:
+                file_stream = make_spooled_file()
+
+                while True:
+                    self.__wait(worker, deadline, path)
+                    chunk = worker.connection.recv_bytes()
+                    if not chunk:
+                        break
+
+                    file_stream.write(chunk)
+
+                file_stream.seek(0)
+        except BaseException:
+            if worker is not None:
+                worker.kill()
+            workers.put(None)
+            raise
+
+        worker.tasks += 1
+        if worker.tasks >= self.max_tasks or memory > self.max_memory:
+            worker.stop()
+            worker = None
+
+        workers.put(worker)
+
+        if error is not None:
+            raise error
+
+        return file_stream
+
+    def __wait(self, worker: _Worker, deadline: float, path: str) -> None:
+        if not worker.connection.poll(max(deadline - monotonic(), 0)):
+            raise RenderTimeoutError(
+                f'Render of {path} took more than {self.timeout} s.'
+            )
+
+    def __get_workers(self) -> LifoQueue:
+        """
+        Stack of idle workers, None is free place for new worker.
+        Recently used workers are taken first, they have warm caches.
+        """
+        with self.__lock:
+            # pool of parent is not usable in forked web worker
+            if self.__pid != os.getpid():
+                self.__workers = LifoQueue()
+                for _ in range(self.size):
+                    self.__workers.put(None)
+                self.__pid = os.getpid()
+
+            return self.__workers
+
+
+render_pool = RenderPool(
+    settings.DOCUMENTS_RENDER_POOL_SIZE,
+    settings.DOCUMENTS_RENDER_POOL_TIMEOUT,
+    settings.DOCUMENTS_RENDER_POOL_MAX_TASKS,
+    settings.DOCUMENTS_RENDER_POOL_MAX_MEMORY,
+)
@@ -0,0 +1,141 @@
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import suppress
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class RenderedDocumentsCache:
+    """
+    Content-addressed cache of rendered documents on local disk.
+    Files are named by key, least recently used files are removed
+    when total size of cache is bigger than max_size bytes.
+    Size of cache is kept as running total, directory is scanned only
+    when total is too big or after every scan_puts puts, so files cached
+    by other processes are counted too. Files are removed down to
+    low_water part of max size, so full cache is not scanned on every put.
+    """
+
+    scan_puts = 100
+    low_water = 0.9
+
+    def __init__(self, directory, max_size: int):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        # unknown until first scan
+        self.size = None
+        self.puts = 0
+
+    def get(self, key: str):
+        "Return opened cached file or None."
+        path = self.__get_path(key)
+
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+        # mtime is used as last access time for LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return file
+
+    def put(self, key: str, file_stream: BinaryIO) -> None:
+        "Cache file, errors of disk (full disk, permissions) are logged."
+        path = self.__get_path(key)
+        tmp = None
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            with tempfile.NamedTemporaryFile(
+                dir=path.parent, prefix='.', delete=False
+            ) as tmp:
+                shutil.copyfileobj(file_stream, tmp)
+                file_size = tmp.tell()
+
+            os.replace(tmp.name, path)
+        except OSError:
+            logger.warning('File %s is not cached', key, exc_info=True)
+
+            if tmp is not None:
+                with suppress(OSError):
+                    os.unlink(tmp.name)
+
+            return
+
+        self.puts += 1
+        if self.size is not None:
+            self.size += file_size
+
+        if (
+            self.size is None
+            or self.size > self.max_size
+            or self.puts % self.scan_puts == 0
+        ):
+            self.evict()
+
+    def get_or_render(self, key: str, render: Callable[[], BinaryIO]):
+        "Return opened cached file, render and cache it if necessary."
+        file = self.get(key)
+        if file is not None:
+            return file
+
+        file_stream = render()
+        if self.max_size <= 0:
+            return file_stream
+
+        self.put(key, file_stream)
+        file_stream.seek(0)
+
+        return file_stream
+
+    def evict(self) -> None:
+        "Remove least recently used files while cache is too big."
+        files = []
+        size = 0
+
+        for path in self.directory.glob('*/*'):
+            # not finished files
+            if path.name.startswith('.'):
+                continue
+
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+
+            files.append((stat.st_mtime, stat.st_size, path))
+            size += stat.st_size
+
+        if size <= self.max_size:
+            self.size = size
+            return
+
+        for _, file_size, path in sorted(files):
+            if size <= self.max_size * self.low_water:
+                break
+
+            path.unlink(missing_ok=True)
+            size -= file_size
+
+        self.size = size
+
+    def __get_path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+
+rendered_documents_cache = RenderedDocumentsCache(
+    settings.RENDERED_DOCUMENTS_CACHE_DIR,
+    settings.RENDERED_DOCUMENTS_CACHE_MAX_SIZE,
+)
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+
+from .documents_plan import DocumentPlan, file_signature
+
+
+class TemplatesCache:
+    """
+    Per process LRU cache of parsed templates (engines instances).
+    Templates are keyed by engine name and path of file and checked by
+    file signature, so replaced file is parsed again.
+    Least recently used templates are evicted when total size of
+    templates is bigger than max_size bytes.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__templates = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, path: str, engine, plan: DocumentPlan = None):
+        "Return cached template of file or parse it by engine."
+        key = (engine.name, path)
+        signature = file_signature(path)
+
+        with self.__lock:
+            cached = self.__templates.get(key)
+
+            if cached is not None and cached[0] == signature:
+                self.__templates.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+
+            self.misses += 1
+
+        template = engine(path, plan or DocumentPlan.ensure(path))
+
+        with self.__lock:
+            self.__pop(key)
+
+            if template.size <= self.max_size:
+                self.__templates[key] = (signature, template)
+                self.size += template.size
+
+            while self.size > self.max_size:
+                self.__pop(next(iter(self.__templates)))
+                self.evictions += 1
+
+        return template
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__templates.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'templates': len(self.__templates),
+            'size': self.size,
+            'max_size': self.max_size,
+        }
+
+    def __pop(self, key) -> None:
+        cached = self.__templates.pop(key, None)
+        if cached is not None:
+            self.size -= cached[1].size
+
+
+templates_cache = TemplatesCache(settings.DOCUMENTS_FORMATTER_CACHE_MAX_SIZE)
@@ -0,0 +1,138 @@
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+from zipfile import ZipFile, ZipInfo
+
+from django.conf import settings
+
+
+render_executor = ThreadPoolExecutor(
+    settings.DOCUMENTS_RENDER_WORKERS,
+    thread_name_prefix='render',
+)
+
+
+def render_in_parallel(
+    renders: Iterable[Callable], workers: int = None
+) -> Iterator:
+    """
+    Run renders on shared bounded pool and yield results in order.
+    Not more than workers (pool size by default) renders of one call
+    are in progress, so results are not stacked in memory.
+    Threads only wait for io: documents are rendered by render pool
+    processes, so workers of documents renders is size of render pool,
+    and renders are run one by one in current thread without it.
+    """
+    workers = min(
+        settings.DOCUMENTS_RENDER_WORKERS
+        if workers is None else workers,
+        settings.DOCUMENTS_RENDER_WORKERS,
+    )
+    if workers <= 1:
+        yield from (render() for render in renders)
+        return
+
+    in_progress = deque()
+
+    for render in renders:
+        in_progress.append(render_executor.submit(render))
+
+        if len(in_progress) >= workers:
+            yield in_progress.popleft().result()
+
+    while in_progress:
+        yield in_progress.popleft().result()
+
+
+class _Buffer:
+    "Unseekable output of zip file, so members are written with descriptors."
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data) -> int:
+        self.data += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+class ZipStream:
+    """
+    Readable file-like zip archive which is written while it is read.
+    Files are (name, opened binary file) pairs, they are stored without
+    compression, because .docx files are already compressed.
+    Files are opened before archive is read, so errors of rendering are
+    raised before response is started instead of truncated archive.
+    Files which are not written yet are closed with stream.
+    """
+
+    def __init__(self, files: list[tuple]):
+        self.__files = list(files)
+        self.__buffer = _Buffer()
+        self.__chunks = self.__write(self.__files)
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.__buffer.data
+
+        while size < 0 or len(data) < size:
+            if next(self.__chunks, None) is None:
+                break
+
+        if size < 0:
+            size = len(data)
+
+        chunk = bytes(data[:size])
+        del data[:size]
+
+        return chunk
+
+    def close(self) -> None:
+        self.__chunks.close()
+
+        for _, file in self.__files:
+            file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __write(self, files):
+        with ZipFile(self.__buffer, 'w') as zip_file:
+            names = set()
+
+            for name, file in files:
+                name = self.__get_unique_name(name, names)
+                info = ZipInfo(name, time.localtime()[:6])
+
+                with file, zip_file.open(info, 'w') as member:
+                    while True:
+                        chunk = file.read(shutil.COPY_BUFSIZE)
+                        if not chunk:
+                            break
+
+                        member.write(chunk)
+                        yield True
+
+        yield True
+
+    @staticmethod
+    def __get_unique_name(name: str, names: set) -> str:
+        stem, dot, extension = name.rpartition('.')
+        if not dot:
+            stem, extension = name, ''
+
+        unique_name, index = name, 1
+
+        while unique_name in names:
+            index += 1
+            unique_name = f'{stem} ({index}){dot}{extension}'
+
+        names.add(unique_name)
+
+        return unique_name
@@ -1,7 +1,186 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'limit'
     max_page_size = 1000
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination by values of all ordering fields of model and id.
+    Page is found by index of ordering fields instead of offset, so deep
+    pages cost the same as first page, and objects are not counted.
+    Cursor is opaque, it contains values of first or last object of page,
+    ordering and direction.
+    """
+
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        values, reverse = self.__decode_cursor(request, queryset.model)
+        ordering = (
+            [self.__invert(field) for field in self.ordering]
+            if reverse else self.ordering
+        )
+
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.__after(ordering, values))
+
+        # one more object shows that there is next page
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+
+        self.page = page
+        if self.has_next or self.has_previous:
+            self.display_page_controls = True
+
+        return page
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Ordering of '?ordering=' of ordering filter of view, ordering of
+        view or model with id, so positions are unique.
+        """
+        ordering = None
+        for backend in getattr(view, 'filter_backends', ()):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+
+        ordering = list(
+            ordering
+            or getattr(view, 'ordering', None)
+            or queryset.model._meta.ordering
+        )
+
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            last = ordering[-1] if ordering else ''
+            ordering.append('-id' if last.startswith('-') else 'id')
+
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        return self.__get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        return self.__get_link(self.page[0], reverse=True)
+
+    def __decode_cursor(self, request, model):
+        "Return (values, reverse) of cursor, values are None without cursor."
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            reverse, ordering, values = json.loads(
+                base64.urlsafe_b64decode(encoded)
+            )
+
+            # values of cursor are positions in ordering of page
+            if (
+                ordering != self.ordering
+                or not isinstance(values, list)
+                or len(values) != len(self.ordering)
+            ):
+                raise ValueError('Cursor of other ordering.')
+
+            values = [
+                self.__to_python(model, field, value)
+                for field, value in zip(ordering, values)
+            ]
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return values, bool(reverse)
+
+    def __encode_cursor(self, values: list, reverse: bool) -> str:
+        return base64.urlsafe_b64encode(
+            json.dumps([int(reverse), self.ordering, values]).encode()
+        ).decode()
+
+    def __get_link(self, obj, reverse: bool) -> str:
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            # rows of values() querysets are dicts
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            # microseconds of dates are kept
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif not isinstance(value, (str, int, float, type(None))):
+                value = str(value)
+
+            values.append(value)
+
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            self.__encode_cursor(values, reverse),
+        )
+
+    @staticmethod
+    def __to_python(model, field: str, value):
+        "Value of cursor converted by model field of ordering."
+        if value is None:
+            raise ValueError('Cursor value is null.')
+
+        *path, name = field.lstrip('-').split('__')
+        for related in path:
+            model = model._meta.get_field(related).related_model
+
+        model_field = (
+            model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        )
+        return model_field.to_python(value)
+
+    @staticmethod
+    def __after(ordering: list, values: list) -> Q:
+        "Filter of objects after position in ordering."
+        after = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                previous.lstrip('-'): value
+                for previous, value in zip(ordering[:index], values)
+            }
+            after |= Q(**equal, **{f'{name}__{lookup}': values[index]})
+
+        return after
+
+    @staticmethod
+    def __invert(field: str) -> str:
+        return field[1:] if field.startswith('-') else f'-{field}'
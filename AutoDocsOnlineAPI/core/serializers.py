@@ -5,6 +5,155 @@ from rest_framework import serializers
 from rest_framework.utils import model_meta
 
 
+def get_prefetch_plan(serializer) -> tuple[list, list]:
+    "Return select_related and prefetch_related declared by serializer Meta."
+    meta = getattr(serializer, 'Meta', None)
+
+    return (
+        list(getattr(meta, 'select_related', ())),
+        list(getattr(meta, 'prefetch_related', ())),
+    )
+
+
+def apply_prefetch_plan(queryset, serializer):
+    """
+    Apply plan of related objects read by serializer to queryset.
+    Plan is declared by 'select_related' and 'prefetch_related'
+    of serializer Meta, so nested serializers do not query every object.
+    Sparse fields serializers skip plan of fields that are not read.
+    """
+    if isinstance(serializer, SparseFieldsSerializer):
+        select_related, prefetch_related = serializer.get_prefetch_plan()
+    else:
+        select_related, prefetch_related = get_prefetch_plan(serializer)
+
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+
+    return queryset
+
+
+def _split_param(request, name: str) -> set[str]:
+    return {
+        value.strip()
+        for param in request.query_params.getlist(name)
+        for value in param.split(',')
+        if value.strip()
+    }
+
+
+class SparseFieldsSerializer(serializers.ModelSerializer):
+    """
+    Read serializer with '?fields=' and '?expand=' of GET request.
+    Without 'fields' all fields are returned. With it only listed fields
+    are returned, and nested serializers are replaced by primary keys
+    unless they are listed in 'expand'. Only fields of root serializer
+    are chosen.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse = self.__get_sparse_fields()
+        if sparse is None:
+            return fields
+
+        requested, expanded = sparse
+        chosen = {}
+
+        for name, field in fields.items():
+            if name not in requested:
+                continue
+
+            if (
+                isinstance(field, serializers.BaseSerializer)
+                and name not in expanded
+            ):
+                field = serializers.PrimaryKeyRelatedField(
+                    read_only=True,
+                    source=field.source,
+                    many=isinstance(field, serializers.ListSerializer),
+                )
+
+            chosen[name] = field
+
+        return chosen
+
+    def get_prefetch_plan(self) -> tuple[list, list]:
+        """
+        Return plan of Meta without relations of fields that are not
+        returned. Relations of nested serializers replaced by primary
+        keys are cut to relations that hold the keys.
+        """
+        select_related, prefetch_related = get_prefetch_plan(self)
+        if self.__get_sparse_fields() is None:
+            return select_related, prefetch_related
+
+        used = []
+        needed = []
+        for field in self.fields.values():
+            source = field.source.replace('.', '__')
+
+            if isinstance(field, serializers.BaseSerializer):
+                used.append(source)
+            elif isinstance(field, serializers.ManyRelatedField) or (
+                # slug and string fields read related object itself
+                isinstance(field, serializers.RelatedField)
+                and not isinstance(field, serializers.PrimaryKeyRelatedField)
+            ):
+                needed.append(source)
+            elif '__' in source:
+                needed.append(source.rsplit('__', 1)[0])
+
+        def cut(paths: list) -> list:
+            plan = []
+            for path in paths:
+                # Prefetch objects are kept with their querysets
+                through = getattr(path, 'prefetch_through', path)
+
+                if any(self.__starts_with(through, source) for source in used):
+                    plan.append(path)
+                    continue
+
+                plan.extend(
+                    path if through == relation else relation
+                    for relation in needed
+                    if self.__starts_with(through, relation)
+                )
+
+            return list(dict.fromkeys(plan))
+
+        return cut(select_related), cut(prefetch_related)
+
+    def __get_sparse_fields(self):
+        "Return (requested, expanded) fields names or None if not chosen."
+        request = self.context.get('request')
+
+        root = self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer)
+            and self.parent.parent is None
+        )
+
+        if (
+            not root
+            or request is None
+            or request.method != 'GET'
+            or 'fields' not in request.query_params
+        ):
+            return None
+
+        return (
+            _split_param(request, 'fields'),
+            _split_param(request, 'expand'),
+        )
+
+    @staticmethod
+    def __starts_with(path: str, relation: str) -> bool:
+        return path == relation or path.startswith(relation + '__')
+
+
 class Base64FileField(serializers.FileField):
     default_error_messages = serializers.FileField.default_error_messages | {
         'invalid_format': 'File must have "docx" format.',
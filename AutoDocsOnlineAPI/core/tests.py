@@ -0,0 +1,392 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest import mock
+from zipfile import ZipFile
+
+from django.test import SimpleTestCase
+from docx import Document as DocxDocument
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from lxml import etree
+
+from core.formatters.documents_plan import DocumentPlan, plan_path
+from core.formatters.docx_parts import get_zip_members
+from core.formatters.engines import DocxEngine, XmlEngine
+from core.formatters.preview import DocumentPreview
+from core.formatters.render_pool import (
+    RenderPool,
+    RenderTimeoutError,
+    _Worker,
+)
+from core.formatters.rendered_cache import RenderedDocumentsCache
+from core.formatters.zip_stream import ZipStream, render_in_parallel
+
+
+def make_docx(*paragraphs: str) -> BytesIO:
+    document = DocxDocument()
+    for text in paragraphs:
+        document.add_paragraph(text)
+
+    file = BytesIO()
+    document.save(file)
+    file.seek(0)
+
+    return file
+
+
+class XmlEngineTest(SimpleTestCase):
+    def test_members_without_placeholders_are_copied_raw(self):
+        template = make_docx('{{name}}')
+        plan = DocumentPlan.compile_file(template)
+        rendered = XmlEngine(template, plan).render({'{{name}}': 'Ivan'})
+
+        with ZipFile(template) as source, ZipFile(rendered) as target:
+            self.assertIsNone(target.testzip())
+            self.assertEqual(target.namelist(), source.namelist())
+
+            for info in source.infolist():
+                if info.filename == 'word/document.xml':
+                    self.assertIn(b'Ivan', target.read(info.filename))
+                    continue
+
+                copied = target.getinfo(info.filename)
+                self.assertEqual(
+                    (copied.CRC, copied.compress_size, copied.compress_type),
+                    (info.CRC, info.compress_size, info.compress_type),
+                )
+
+
+FOOTNOTES_XML = (
+    '<w:footnotes xmlns:w="http://schemas.openxmlformats.org/'
+    'wordprocessingml/2006/main"><w:footnote w:id="1"><w:p>'
+    '<w:r><w:t>Note {{</w:t></w:r><w:r><w:t>na</w:t></w:r>'
+    '<w:r><w:t>me}}</w:t></w:r></w:p></w:footnote></w:footnotes>'
+)
+
+
+def make_split_placeholders_docx() -> BytesIO:
+    "Template with placeholder split across runs in body, header, footnote."
+    document = DocxDocument()
+    for paragraph in (
+        document.add_paragraph(),
+        document.sections[0].header.paragraphs[0],
+    ):
+        paragraph.add_run('Dear {{na')
+        paragraph.add_run('me}}').bold = True
+        paragraph.add_run('!')
+
+    source = BytesIO()
+    document.save(source)
+
+    # python-docx can not add footnotes, so part is added to archive
+    file = BytesIO()
+    with ZipFile(source) as source_zip, ZipFile(file, 'w') as target:
+        for info in source_zip.infolist():
+            data = source_zip.read(info)
+            if info.filename == '[Content_Types].xml':
+                data = data.replace(b'</Types>', (
+                    '<Override PartName="/word/footnotes.xml" ContentType="'
+                    'application/vnd.openxmlformats-officedocument.'
+                    'wordprocessingml.footnotes+xml"/></Types>'
+                ).encode())
+            elif info.filename == 'word/_rels/document.xml.rels':
+                data = data.replace(b'</Relationships>', (
+                    '<Relationship Id="rId100" Type="http://schemas.'
+                    'openxmlformats.org/officeDocument/2006/relationships/'
+                    'footnotes" Target="footnotes.xml"/></Relationships>'
+                ).encode())
+
+            target.writestr(info, data)
+
+        target.writestr('word/footnotes.xml', FOOTNOTES_XML)
+
+    file.seek(0)
+
+    return file
+
+
+class EnginesTest(SimpleTestCase):
+    def get_texts(self, file) -> dict:
+        "Text of paragraphs of every part with placeholders."
+        with ZipFile(file) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+
+            return {
+                partname: [
+                    ''.join(
+                        node.text or ''
+                        for node in paragraph.iter(qn('w:t'))
+                    )
+                    for paragraph in etree.fromstring(
+                        zip_file.read(name)
+                    ).iter(qn('w:p'))
+                ]
+                for partname, name in get_zip_members(zip_file).items()
+            }
+
+    def test_engines_fill_split_placeholders_equally(self):
+        template = make_split_placeholders_docx()
+        plan = DocumentPlan.compile_file(template)
+        data = {'{{name}}': 'Ivan'}
+
+        texts = [
+            self.get_texts(engine(template, plan).render(data))
+            for engine in (DocxEngine, XmlEngine)
+        ]
+
+        self.assertEqual(texts[0], texts[1])
+        self.assertEqual(texts[0], {
+            '/word/document.xml': ['Dear Ivan!'],
+            '/word/header1.xml': ['Dear Ivan!'],
+            '/word/footnotes.xml': ['Note Ivan'],
+        })
+
+
+class DocumentPlanTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        self.path = os.path.join(self.directory, 'template.docx')
+        with open(self.path, 'wb') as file:
+            file.write(make_docx('{{name}}').getvalue())
+
+    def test_concurrent_saves_keep_valid_plan(self):
+        plan = DocumentPlan.ensure(self.path)
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(
+                lambda _: plan.save(self.path), range(100)
+            ))
+
+        self.assertEqual(DocumentPlan.load(self.path).parts, plan.parts)
+        # temporary files of saves are not left
+        self.assertEqual(
+            set(os.listdir(self.directory)),
+            {'template.docx', os.path.basename(plan_path(self.path))},
+        )
+
+    def test_failed_save_removes_temporary_file(self):
+        plan = DocumentPlan.ensure(self.path)
+        os.unlink(plan_path(self.path))
+
+        with mock.patch('os.replace', side_effect=OSError):
+            # plan is not saved, document is rendered without it
+            self.assertEqual(DocumentPlan.ensure(self.path).parts, plan.parts)
+
+        self.assertEqual(os.listdir(self.directory), ['template.docx'])
+
+
+class RenderedDocumentsCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = RenderedDocumentsCache(self.directory, 100)
+
+    def put(self, key: str, mtime: int) -> None:
+        self.cache.put(key, BytesIO(b'x' * 30))
+        os.utime(os.path.join(self.directory, key[:2], key), (mtime, mtime))
+
+    def get_keys(self) -> set[str]:
+        return {
+            name
+            for _, _, files in os.walk(self.directory)
+            for name in files
+        }
+
+    def test_least_recently_used_files_are_evicted(self):
+        for index, key in enumerate(('aa1', 'aa2', 'ab3'), 1):
+            self.put(key, index)
+
+        # used file becomes the most recent one
+        self.cache.get('aa1').close()
+        self.put('ab4', 4)
+
+        # files are evicted down to low water of max size
+        self.assertEqual(self.get_keys(), {'aa1', 'ab3', 'ab4'})
+        self.assertEqual(self.cache.size, 90)
+
+        self.assertIsNone(self.cache.get('aa2'))
+        with self.cache.get_or_render('aa2', lambda: BytesIO(b'y')) as file:
+            self.assertEqual(file.read(), b'y')
+        self.assertEqual(self.cache.get('aa2').read(), b'y')
+
+    def test_errors_of_disk_do_not_fail_render(self):
+        def copy_partially(source, target):
+            target.write(source.read(1))
+            raise OSError(28, 'No space left on device')
+
+        with mock.patch('shutil.copyfileobj', copy_partially), \
+                self.assertLogs('core.formatters.rendered_cache', 'WARNING'):
+            file = self.cache.get_or_render(
+                'aa1', lambda: BytesIO(b'rendered')
+            )
+
+        self.assertEqual(file.read(), b'rendered')
+        # temporary file is removed, document is not cached
+        self.assertEqual(self.get_keys(), set())
+        self.assertIsNone(self.cache.get('aa1'))
+
+
+class RenderPoolTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.path = os.path.join(directory.name, 'template.docx')
+        with open(self.path, 'wb') as file:
+            file.write(make_docx('{{name}}').getvalue())
+
+        # render of fifo waits for writer until it is killed
+        self.fifo = os.path.join(directory.name, 'fifo.docx')
+        os.mkfifo(self.fifo)
+
+        self.workers = []
+
+        def start_worker(context):
+            self.workers.append(_Worker(context))
+            return self.workers[-1]
+
+        patcher = mock.patch(
+            'core.formatters.render_pool._Worker', side_effect=start_worker
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.pool = RenderPool(1, 30, max_tasks=2, max_memory=2 ** 40)
+        self.addCleanup(self.stop_workers)
+
+    def stop_workers(self):
+        for worker in self.workers:
+            worker.kill()
+
+    def render(self) -> bytes:
+        with self.pool.render(self.path, 'xml', {'{{name}}': 'Ivan'}) as file:
+            with ZipFile(file) as zip_file:
+                return zip_file.read('word/document.xml')
+
+    def test_workers_are_replaced_after_max_tasks(self):
+        for _ in range(3):
+            self.assertIn(b'Ivan', self.render())
+
+        self.assertEqual(len(self.workers), 2)
+        # replaced worker exits when its connection is closed
+        self.workers[0].process.join(10)
+        self.assertEqual(self.workers[0].process.exitcode, 0)
+        self.assertTrue(self.workers[1].process.is_alive())
+
+    def test_worker_is_killed_on_timeout(self):
+        # start of spawned process is not limited by short timeout
+        self.render()
+        self.pool.timeout = 0.5
+
+        with self.assertRaises(RenderTimeoutError):
+            self.pool.render(self.fifo, 'xml', {})
+
+        self.assertIsNotNone(self.workers[0].process.exitcode)
+
+        self.pool.timeout = 30
+        self.assertIn(b'Ivan', self.render())
+        self.assertEqual(len(self.workers), 2)
+
+
+class ZipStreamTest(SimpleTestCase):
+    def test_files_are_archived_while_stream_is_read(self):
+        large = os.urandom(3 * 2 ** 20)
+        files = [
+            ('a.docx', BytesIO(b'first')),
+            ('a.docx', BytesIO(large)),
+            ('b', BytesIO(b'')),
+            ('b', BytesIO(b'last')),
+        ]
+
+        archive = BytesIO()
+        with ZipStream(files) as stream:
+            while True:
+                chunk = stream.read(1000)
+                if not chunk:
+                    break
+                archive.write(chunk)
+
+        with ZipFile(archive) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(
+                [(name, zip_file.read(name)) for name in zip_file.namelist()],
+                [
+                    ('a.docx', b'first'),
+                    ('a (2).docx', large),
+                    ('b', b''),
+                    ('b (2)', b'last'),
+                ],
+            )
+
+        self.assertTrue(all(file.closed for _, file in files))
+
+    def test_not_written_files_are_closed(self):
+        files = [('a', BytesIO(b'a' * 2 ** 20)), ('b', BytesIO(b'b'))]
+
+        with ZipStream(files) as stream:
+            stream.read(10)
+
+        self.assertTrue(all(file.closed for _, file in files))
+
+    def test_renders_are_yielded_in_order(self):
+        def render(index):
+            # later renders are finished first
+            time.sleep((5 - index) / 100)
+            return index
+
+        with self.settings(DOCUMENTS_RENDER_WORKERS=4):
+            self.assertEqual(
+                list(render_in_parallel(
+                    (lambda index=index: render(index)) for index in range(5)
+                )),
+                list(range(5)),
+            )
+
+
+class DocumentPreviewTest(SimpleTestCase):
+    def test_nested_blocks_are_projected(self):
+        document = DocxDocument()
+        document.add_paragraph('{{body}}')
+
+        cell = document.add_table(1, 2).cell(0, 0)
+        cell.paragraphs[0].text = '{{cell}}'
+        cell.add_table(1, 1).cell(0, 0).paragraphs[0].text = '{{nested}}'
+
+        # paragraphs of block content control and of unknown block
+        for tag, text in (('w:sdt', '{{control}}'), ('w:ins', '{{other}}')):
+            block = OxmlElement(tag)
+            content = block
+            if tag == 'w:sdt':
+                content = OxmlElement('w:sdtContent')
+                block.append(content)
+
+            content.append(document.add_paragraph(text)._p)
+            document.element.body.insert(-1, block)
+
+        file = BytesIO()
+        document.save(file)
+        file.seek(0)
+
+        preview = DocumentPreview(file, None).render({
+            key: key.strip('{}').upper()
+            for key in ('{{body}}', '{{cell}}', '{{nested}}', '{{control}}')
+        })
+
+        self.assertEqual(
+            preview['text'].splitlines(),
+            # cell ends with paragraph after nested table
+            ['BODY', 'CELL NESTED \t', 'CONTROL', '[content omitted]'],
+        )
+        self.assertIn(
+            '<td><p>CELL</p><table><tr><td><p>NESTED</p></td></tr></table>'
+            '<p></p></td>',
+            preview['html'],
+        )
+        self.assertNotIn('{{other}}', preview['html'])
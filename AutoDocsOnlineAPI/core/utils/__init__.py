@@ -1,3 +1,5 @@
 from .make_confirm_code import make_confirm_code
 from .make_document_directory_path import make_documents_directory_path
+from .make_job_directory_path import make_jobs_directory_path
+from .make_spooled_file import make_spooled_file
 from .short import short
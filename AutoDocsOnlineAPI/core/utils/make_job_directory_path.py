@@ -0,0 +1,2 @@
+def make_jobs_directory_path(job, filename):
+    return f'{job.user.id}/{job.id}/{filename}'
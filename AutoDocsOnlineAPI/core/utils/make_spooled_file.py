@@ -0,0 +1,8 @@
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+
+
+def make_spooled_file() -> SpooledTemporaryFile:
+    "File in memory which is moved to disk when it becomes too big."
+    return SpooledTemporaryFile(settings.SPOOLED_FILE_MAX_SIZE)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class DocumentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'documents'
+
+    def ready(self):
+        from .signals import connect_catalog_changes, connect_versions
+
+        connect_versions()
+        connect_catalog_changes()
@@ -0,0 +1,220 @@
+import hashlib
+from collections import defaultdict
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterator
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, FilteredRelation, Q
+
+from core.formatters import (
+    DocumentsFormatter,
+    ExcelFormatter,
+    RecordsFormatter,
+    ZipStream,
+    make_excel_workbook,
+    render_in_parallel,
+    render_pool,
+)
+from core.formatters.rendered_cache import RenderedDocumentsCache
+
+from .models import Template
+from .records_rows_cache import records_rows_cache
+
+
+records_excel_cache = RenderedDocumentsCache(
+    settings.RECORDS_EXPORTS_CACHE_DIR / 'excel',
+    settings.RECORDS_EXPORTS_CACHE_MAX_SIZE,
+)
+
+
+def get_filled_documents_zip(record) -> tuple[ZipStream, str]:
+    "Return zip of all filled documents of record and its filename."
+    templates_values = record.templates_values.select_related('template')
+
+    names = []
+    renders = []
+    for document in record.documents_package.documents.all():
+        names.append(document.file.name.split('/')[-1])
+        renders.append(
+            DocumentsFormatter(
+                document.file.path, templates_values
+            ).format_cached
+        )
+
+    # all documents are rendered before archive is streamed,
+    # rendered files are spooled to disk or taken from cache
+    files = []
+    try:
+        for file in render_in_parallel(renders, workers=render_pool.size):
+            files.append(file)
+    except BaseException:
+        for file in files:
+            file.close()
+        raise
+
+    return (
+        ZipStream(list(zip(names, files))),
+        record.documents_package.title + '.zip'
+    )
+
+
+def get_records_rows(records, templates) -> Iterator[tuple]:
+    """
+    Yield (id, creation date, {template id: value}) of every record,
+    records without values of templates have empty values.
+    Values of all records are fetched by one query and read in chunks.
+    """
+    records = records.order_by('creation_date', 'id')
+
+    # join of values of no templates is empty query
+    if not templates:
+        for record_id, creation_date in records.values_list(
+            'id', 'creation_date'
+        ).iterator(chunk_size=settings.RECORDS_EXPORT_CHUNK_SIZE):
+            yield record_id, creation_date, {}
+
+        return
+
+    values = (
+        records
+        .annotate(
+            package_values=FilteredRelation(
+                'templates_values',
+                condition=Q(templates_values__template__in=templates),
+            )
+        )
+        .values_list(
+            'id', 'creation_date',
+            'package_values__template', 'package_values__value',
+        )
+        .iterator(chunk_size=settings.RECORDS_EXPORT_CHUNK_SIZE)
+    )
+
+    for (record_id, creation_date), record_values in groupby(
+        values, key=itemgetter(0, 1)
+    ):
+        # values of other templates are not joined
+        yield record_id, creation_date, {
+            template_id: value
+            for _, _, template_id, value in record_values
+            if template_id is not None
+        }
+
+
+def get_records_excel(documents_package):
+    """
+    Return excel summary of documents package records and its filename.
+    Excel is cached until records of package or its columns are changed.
+    """
+    templates = list(documents_package.templates)
+    rows, version = records_rows_cache.get_rows(
+        documents_package, templates, get_records_rows
+    )
+    formatter = ExcelFormatter(
+        rows, templates, title=documents_package.title
+    )
+
+    columns = [(str(template.pk), template.title) for template in templates]
+    key = hashlib.sha256(
+        f'{version}{columns}{formatter.write_only}'.encode()
+    ).hexdigest()
+
+    excel = records_excel_cache.get_or_render(
+        key, lambda: formatter.make_excel_data_summary()[0]
+    )
+    # rows are not read if excel is cached
+    rows.close()
+
+    return excel, formatter.filename + '.xlsx'
+
+
+def get_records_lines(documents_package, export_format):
+    """
+    Return iterator of chunks of records in csv or json lines format and
+    its filename. Only records created after previous export are fetched,
+    other rows are read from cache while chunks are iterated. Fetched
+    rows are sent while they are cached, so first chunk is not delayed.
+    """
+    templates = list(documents_package.templates)
+    rows = records_rows_cache.stream_rows(
+        documents_package, templates, get_records_rows
+    )
+
+    formatter = RecordsFormatter(
+        rows, templates, title=documents_package.title
+    )
+
+    return (
+        formatter.format(export_format),
+        f'{formatter.filename}.{export_format}'
+    )
+
+
+def get_packages_templates(documents_packages) -> dict:
+    "Return {package id: templates of package} by one query."
+    templates = (
+        Template.objects
+        .filter(
+            documents__document__documents_packages__documents_package__in=(
+                documents_packages
+            )
+        )
+        .annotate(
+            package_id=F(
+                'documents__document__documents_packages__documents_package'
+            )
+        )
+        .distinct()
+    )
+
+    packages_templates = defaultdict(list)
+    for template in templates:
+        packages_templates[template.package_id].append(template)
+
+    return packages_templates
+
+
+def get_packages_excel(documents_packages):
+    """
+    Return excel workbook with sheet of records of every documents
+    package and its filename. Rows of next packages are fetched in
+    parallel while sheets of previous packages are filled.
+    """
+    documents_packages = list(documents_packages)
+    packages_templates = get_packages_templates(documents_packages)
+
+    def get_rows(documents_package):
+        def fetch():
+            try:
+                rows, _ = records_rows_cache.get_rows(
+                    documents_package,
+                    packages_templates[documents_package.pk],
+                    get_records_rows,
+                )
+                return rows
+            finally:
+                # connections of pool threads are not closed by requests
+                connections.close_all()
+
+        return fetch
+
+    packages_rows = render_in_parallel(
+        get_rows(documents_package) for documents_package in documents_packages
+    )
+    excel = make_excel_workbook(
+        ExcelFormatter(
+            rows,
+            packages_templates[documents_package.pk],
+            title=documents_package.title,
+        )
+        for documents_package, rows in zip(documents_packages, packages_rows)
+    )
+
+    return excel, (
+        'documents_packages'
+        + datetime.now().strftime(settings.EXCEL_FORMATTER_TITLE_STRFTIME)
+        + '.xlsx'
+    )
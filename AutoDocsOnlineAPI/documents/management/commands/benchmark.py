@@ -0,0 +1,428 @@
+import multiprocessing
+import os
+import resource
+import string
+import struct
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from docx import Document as DocxDocument
+from docx.shared import Cm
+
+from core.formatters import (
+    DocumentsFormatter,
+    ExcelFormatter,
+    render_batch,
+    render_pool,
+    templates_cache,
+)
+from api.fast_serializers import (
+    FastSelfRecordsSerializer,
+    FastTemplateSerializer,
+)
+from api.serializers import GetSelfRecordsSerializer, TemplateSerializer
+from core.formatters.engines import ENGINES
+from core.serializers import apply_prefetch_plan
+from documents.models import (
+    DocumentsPackage,
+    Record,
+    RecordTemplateValue,
+    Template,
+    TemplateValue,
+)
+from users.models import User
+
+
+KEYS = [f'{{{{key-{letter}}}}}' for letter in string.ascii_lowercase]
+IMAGE_SIZE = 256
+
+
+def make_png(width: int, height: int) -> bytes:
+    "Return png image with random noise, so it can not be compressed."
+    def chunk(tag, data):
+        return (
+            struct.pack('>I', len(data))
+            + tag
+            + data
+            + struct.pack('>I', zlib.crc32(tag + data))
+        )
+
+    raw = b''.join(b'\x00' + os.urandom(width * 3) for _ in range(height))
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', header)
+        + chunk(b'IDAT', zlib.compress(raw))
+        + chunk(b'IEND', b'')
+    )
+
+
+def make_template(path: str, paragraphs: int, images: int) -> None:
+    "Make large .docx template with split placeholders and images."
+    document = DocxDocument()
+    document.sections[0].header.paragraphs[0].text = 'Header {{key-a}}'
+
+    for index in range(paragraphs):
+        key = KEYS[index % len(KEYS)]
+        p = document.add_paragraph(f'Paragraph {index} with value ')
+        # split placeholder into runs like Word does
+        p.add_run(key[:4])
+        p.add_run(key[4:]).bold = True
+        p.add_run(' and some text after it.')
+
+        if images and index % max(paragraphs // images, 1) == 0:
+            document.add_picture(
+                BytesIO(make_png(IMAGE_SIZE, IMAGE_SIZE)), width=Cm(3)
+            )
+
+    document.save(path)
+
+
+def get_data(index: int = 0) -> dict:
+    return {key: f'value {index} of {key}' for key in KEYS}
+
+
+def get_file_size(file) -> int:
+    file.seek(0, os.SEEK_END)
+    return file.tell()
+
+
+def get_peak_memory() -> int:
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_in_process(function, *args):
+    """
+    Return result of function called in forked process.
+    Peak RSS only grows, so every measurement needs own process.
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+
+    process = context.Process(
+        target=lambda: results.put(function(*args))
+    )
+    process.start()
+    result = results.get()
+    process.join()
+
+    return result
+
+
+def measure_concurrent_renders(path, concurrency, in_memory) -> tuple:
+    """
+    Render document concurrently and keep all results opened, like
+    slow clients of downloads do. Return (baseline, peak) RSS.
+    """
+    templates_values = get_templates_values()
+    render_pool.size = 0
+
+    # template is parsed before baseline
+    DocumentsFormatter(path, templates_values).format().close()
+    baseline = get_peak_memory()
+
+    def render(_):
+        file_stream = DocumentsFormatter(path, templates_values).format()
+        if in_memory:
+            with file_stream:
+                return BytesIO(file_stream.read())
+
+        return file_stream
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        files = list(executor.map(render, range(concurrency)))
+
+    peak = get_peak_memory()
+
+    for file in files:
+        file.close()
+
+    return baseline, peak
+
+
+def measure_excel(rows, columns, write_only) -> tuple:
+    "Make excel of generated rows, return (seconds, baseline, peak) RSS."
+    templates = [
+        Template(id=index, title=f'Template {index}')
+        for index in range(columns)
+    ]
+    now = datetime.now()
+    values = {
+        template.pk: f'value of template {template.pk}'
+        for template in templates
+    }
+
+    baseline = get_peak_memory()
+    start = perf_counter()
+
+    file_stream, _ = ExcelFormatter(
+        ((now, values) for _ in range(rows)),
+        templates,
+        write_only=write_only,
+    ).make_excel_data_summary()
+    file_stream.close()
+
+    return perf_counter() - start, baseline, get_peak_memory()
+
+
+def make_records(objects: int, columns: int) -> User:
+    "Make user with templates and records with values of every template."
+    user = User.objects.create(
+        username='benchmark', email='benchmark@example.com'
+    )
+    templates = Template.objects.bulk_create(
+        Template(
+            author=user,
+            title=f'Template {index}',
+            name_in_document=f'{{{{benchmark-{index}}}}}',
+        )
+        for index in range(objects)
+    )
+    documents_package = DocumentsPackage.objects.create(
+        title='Benchmark package', author=user
+    )
+    templates_values = TemplateValue.objects.bulk_create(
+        TemplateValue(template=template, value=f'value of {template.title}')
+        for template in templates[:columns]
+    )
+    records = Record.objects.bulk_create(
+        Record(user=user, documents_package=documents_package)
+        for _ in range(objects)
+    )
+    RecordTemplateValue.objects.bulk_create(
+        RecordTemplateValue(record=record, template_value=template_value)
+        for record in records
+        for template_value in templates_values
+    )
+
+    return user
+
+
+def measure_serializer(serialize, repeats: int) -> tuple:
+    "Return best seconds of serialization."
+    best = None
+    for _ in range(repeats):
+        start = perf_counter()
+        serialize()
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def get_templates_values():
+    return [
+        TemplateValue(
+            template=Template(name_in_document=key), value=f'value of {key}'
+        )
+        for key in KEYS
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Run performance benchmarks.'
+    benchmarks_list = ['engines', 'batch', 'memory', 'excel', 'serializers']
+
+    def handle(self, **options):
+        for benchmark in self.benchmarks_list:
+            if options[benchmark]:
+                self.__getattribute__('benchmark_' + benchmark)(**options)
+
+    def add_arguments(self, parser):
+        for benchmark in self.benchmarks_list:
+            parser.add_argument(
+                f'--{benchmark}',
+                action='store_true',
+                default=False,
+                help=f'run {benchmark} benchmark'
+            )
+
+        parser.add_argument('--paragraphs', type=int, default=2000)
+        parser.add_argument('--images', type=int, default=50)
+        parser.add_argument('--renders', type=int, default=10)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument(
+            '--size', type=int, default=10, help='size of document in MB'
+        )
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--columns', type=int, default=30)
+        parser.add_argument(
+            '--objects',
+            type=int,
+            default=1000,
+            help='number of records and templates of serializers benchmark',
+        )
+
+    def benchmark_engines(self, paragraphs, images, renders, **options):
+        "Compare documents formatter engines on one large template."
+        templates_values = get_templates_values()
+        # engines are measured in this process, not in render pool
+        render_pool.size = 0
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'template.docx')
+            make_template(path, paragraphs, images)
+            print(
+                f'template: {paragraphs} paragraphs, {images} images, '
+                f'{os.path.getsize(path) / 2 ** 20:.1f} MB'
+            )
+
+            for engine in ENGINES:
+                templates_cache.clear()
+
+                start = perf_counter()
+                DocumentsFormatter(
+                    path, templates_values, engine=engine
+                ).format()
+                cold = perf_counter() - start
+
+                start = perf_counter()
+                for _ in range(renders):
+                    size = get_file_size(
+                        DocumentsFormatter(
+                            path, templates_values, engine=engine
+                        ).format()
+                    )
+                warm = (perf_counter() - start) / renders
+
+                print(
+                    f'{engine}: first render {cold * 1000:.1f} ms, '
+                    f'cached template {warm * 1000:.1f} ms per render, '
+                    f'result {size / 2 ** 20:.1f} MB, '
+                    f'cache {templates_cache.stats()}'
+                )
+
+    def benchmark_batch(self, paragraphs, images, renders, **options):
+        "Render template bytes with many value sets by pure batch render."
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'template.docx')
+            make_template(path, paragraphs, images)
+            with open(path, 'rb') as file:
+                template = file.read()
+
+        print(
+            f'template: {paragraphs} paragraphs, {images} images, '
+            f'{len(template) / 2 ** 20:.1f} MB'
+        )
+
+        for engine in ENGINES:
+            start = perf_counter()
+            documents = render_batch(
+                template,
+                (get_data(index) for index in range(renders)),
+                engine=engine,
+            )
+            first = next(documents)
+            cold = perf_counter() - start
+
+            start = perf_counter()
+            size = get_file_size(first) + sum(
+                get_file_size(document) for document in documents
+            )
+            elapsed = perf_counter() - start
+
+            print(
+                f'{engine}: parse and first render {cold * 1000:.1f} ms, '
+                f'{renders - 1} more renders in {elapsed:.2f} s '
+                f'({(renders - 1) / max(elapsed, 1e-9):.1f} docs/sec), '
+                f'total {size / 2 ** 20:.1f} MB'
+            )
+
+    def benchmark_memory(self, concurrency, size, **options):
+        "Peak RSS of concurrent renders of large document, BytesIO vs spooled."
+        png_size = len(make_png(IMAGE_SIZE, IMAGE_SIZE))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'template.docx')
+            make_template(path, 200, size * 2 ** 20 // png_size)
+            print(
+                f'{concurrency} concurrent renders of '
+                f'{os.path.getsize(path) / 2 ** 20:.1f} MB document, '
+                f'spooled file max size {settings.SPOOLED_FILE_MAX_SIZE} B'
+            )
+
+            for mode, in_memory in (('BytesIO', True), ('spooled', False)):
+                baseline, peak = run_in_process(
+                    measure_concurrent_renders, path, concurrency, in_memory
+                )
+
+                print(
+                    f'{mode}: peak RSS {peak / 2 ** 20:.1f} MB, '
+                    f'{(peak - baseline) / 2 ** 20:.1f} MB over baseline'
+                )
+
+    def benchmark_excel(self, rows, columns, **options):
+        "Compare normal and write only excel workbooks on many rows."
+        print(f'excel of {rows} rows and {columns + 1} columns')
+
+        for mode, write_only in (('normal', False), ('write only', True)):
+            elapsed, baseline, peak = run_in_process(
+                measure_excel, rows, columns, write_only
+            )
+
+            print(
+                f'{mode}: {elapsed:.1f} s '
+                f'({rows / max(elapsed, 1e-9):.0f} rows/sec), '
+                f'peak RSS {peak / 2 ** 20:.1f} MB, '
+                f'{(peak - baseline) / 2 ** 20:.1f} MB over baseline'
+            )
+
+    def benchmark_serializers(self, objects, columns, renders, **options):
+        """
+        Compare model serializers and values serializers of list endpoints,
+        parity of their data is checked by api tests. Objects are made in
+        transaction which is rolled back.
+        """
+        with transaction.atomic():
+            user = make_records(objects, columns)
+            print(
+                f'{objects} templates, {objects} records '
+                f'with {columns} values'
+            )
+
+            cases = (
+                (
+                    'templates',
+                    Template.objects.filter(author=user),
+                    TemplateSerializer,
+                    FastTemplateSerializer,
+                ),
+                (
+                    'records',
+                    Record.objects.filter(user=user),
+                    GetSelfRecordsSerializer,
+                    FastSelfRecordsSerializer,
+                ),
+            )
+
+            for name, queryset, serializer, values_serializer in cases:
+                model_time = measure_serializer(
+                    lambda: serializer(
+                        apply_prefetch_plan(queryset, serializer()),
+                        many=True,
+                    ).data,
+                    renders,
+                )
+                values_time = measure_serializer(
+                    lambda: values_serializer(
+                        values_serializer.get_queryset(queryset)
+                    ).data,
+                    renders,
+                )
+
+                print(
+                    f'{name}: model serializer {model_time * 1000:.1f} ms, '
+                    f'values serializer {values_time * 1000:.1f} ms '
+                    f'({model_time / max(values_time, 1e-9):.1f}x)'
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.formatters import DocumentPlan
+from documents.models import Document
+
+
+class Command(BaseCommand):
+    help = 'Compile placeholders plans for documents which have not it.'
+
+    def handle(self, **options):
+        compiled = 0
+
+        for document in Document.objects.all().iterator():
+            if DocumentPlan.load(document.file.path) is None:
+                DocumentPlan.ensure(document.file.path)
+                compiled += 1
+
+        print(f'compiled {compiled} documents plans')
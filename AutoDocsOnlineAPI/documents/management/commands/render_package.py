@@ -0,0 +1,191 @@
+import os
+import resource
+import shutil
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from zipfile import ZipFile
+
+import django
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.formatters.engines import ENGINES
+from core.formatters.templates_cache import templates_cache
+from documents.models import DocumentsPackage, Record, RecordTemplateValue
+
+
+TASKS_CHUNK_SIZE = 8
+ERRORS_SHOW_COUNT = 10
+
+
+def render_to_file(task) -> tuple:
+    """
+    Render one document of one record in worker process.
+    Template is parsed only once per worker by templates cache.
+    Return (output name, error or None).
+    """
+    path, engine, data, output_path, name = task
+
+    try:
+        file_stream = templates_cache.get(path, ENGINES[engine]).render(data)
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'wb') as file:
+            shutil.copyfileobj(file_stream, file)
+    except Exception as error:
+        return name, f'{type(error).__name__}: {error}'
+
+    return name, None
+
+
+def get_unique_names(documents) -> list[str]:
+    names = []
+
+    for document in documents:
+        name = os.path.basename(document.file.name)
+        if name in names:
+            name = f'{document.pk}_{name}'
+        names.append(name)
+
+    return names
+
+
+class Command(BaseCommand):
+    help = 'Render documents of all records of documents package.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('package', help='documents package id or title')
+        parser.add_argument(
+            'output',
+            help='output directory or .zip file'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='number of worker processes'
+        )
+        parser.add_argument(
+            '--engine',
+            choices=list(ENGINES),
+            default=settings.DOCUMENTS_FORMATTER_ENGINE,
+        )
+
+    def handle(self, package, output, workers, engine, **options):
+        documents_package = self.get_documents_package(package)
+        to_zip = output.endswith('.zip')
+        directory = tempfile.mkdtemp() if to_zip else output
+
+        try:
+            tasks = self.get_tasks(documents_package, engine, directory)
+
+            start = perf_counter()
+            errors = self.render(tasks, workers)
+            elapsed = perf_counter() - start
+
+            if to_zip:
+                self.make_zip(directory, output)
+        finally:
+            if to_zip:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        self.report(len(tasks), errors, elapsed)
+
+    def get_documents_package(self, package):
+        documents_package = DocumentsPackage.objects.filter(
+            title=package
+        ).first()
+
+        if documents_package is None:
+            try:
+                documents_package = DocumentsPackage.objects.filter(
+                    pk=package
+                ).first()
+            except ValidationError:
+                pass
+
+        if documents_package is None:
+            raise CommandError(f'Documents package {package} not found.')
+
+        return documents_package
+
+    def get_tasks(self, documents_package, engine, directory) -> list:
+        documents = list(documents_package.documents.all())
+        names = get_unique_names(documents)
+
+        data = defaultdict(dict)
+        for record_id, name_in_document, value in (
+            RecordTemplateValue.objects
+            .filter(record__documents_package=documents_package)
+            .values_list(
+                'record_id',
+                'template_value__template__name_in_document',
+                'template_value__value',
+            )
+        ):
+            data[record_id][name_in_document] = value
+
+        tasks = []
+        records = Record.objects.filter(
+            documents_package=documents_package
+        ).select_related('user')
+
+        # tasks are grouped by document, so worker renders the same template
+        for document, name in zip(documents, names):
+            for record in records:
+                record_directory = f'{record.user.username}_{record.pk}'
+                tasks.append((
+                    document.file.path,
+                    engine,
+                    data[record.pk],
+                    os.path.join(directory, record_directory, name),
+                    os.path.join(record_directory, name),
+                ))
+
+        return tasks
+
+    def render(self, tasks, workers) -> list:
+        # workers must not share database connections with main process
+        connections.close_all()
+
+        with ProcessPoolExecutor(workers, initializer=django.setup) as pool:
+            return [
+                (name, error)
+                for name, error in pool.map(
+                    render_to_file, tasks, chunksize=TASKS_CHUNK_SIZE
+                )
+                if error is not None
+            ]
+
+    def make_zip(self, directory, output) -> None:
+        # documents are already compressed
+        with ZipFile(output, 'w') as zip_file:
+            for root, _, files in os.walk(directory):
+                for file in sorted(files):
+                    path = os.path.join(root, file)
+                    zip_file.write(path, os.path.relpath(path, directory))
+
+    def report(self, count, errors, elapsed) -> None:
+        # ru_maxrss is in kilobytes on linux
+        self_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        workers_memory = resource.getrusage(
+            resource.RUSAGE_CHILDREN
+        ).ru_maxrss
+
+        print(
+            f'rendered {count - len(errors)} of {count} documents '
+            f'in {elapsed:.1f} s ({count / max(elapsed, 1e-9):.1f} docs/sec)'
+        )
+        print(
+            f'peak memory: main process {self_memory / 1024:.1f} MB, '
+            f'worker process {workers_memory / 1024:.1f} MB'
+        )
+
+        if errors:
+            print(f'failures: {len(errors)}')
+            for name, error in errors[:ERRORS_SHOW_COUNT]:
+                print(f'  {name}: {error}')
@@ -0,0 +1,33 @@
+# Generated by Django 3.2 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='documentspackage',
+            options={'ordering': ['title'], 'verbose_name': 'Documents package', 'verbose_name_plural': 'Documents packages'},
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['creation_date', 'id'], name='documents_d_creatio_49b4c5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['user', 'creation_date', 'id'], name='documents_r_user_id_73085e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['documents_package', 'creation_date', 'id'], name='documents_r_documen_d79a33_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='template',
+            index=models.Index(fields=['title', 'id'], name='documents_t_title_3a75d2_idx'),
+        ),
+    ]
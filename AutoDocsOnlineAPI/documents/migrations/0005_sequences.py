@@ -0,0 +1,48 @@
+# Generated by Django 3.2 on 2026-10-18 17:30
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def move_catalog_version(apps, schema_editor):
+    "Catalog sequence was stored as model version named 'catalog'."
+    ModelVersion = apps.get_model('documents', 'ModelVersion')
+    Sequence = apps.get_model('documents', 'Sequence')
+
+    for version in ModelVersion.objects.filter(model='catalog'):
+        Sequence.objects.create(name=version.model, value=version.version)
+        version.delete()
+
+
+def restore_catalog_version(apps, schema_editor):
+    ModelVersion = apps.get_model('documents', 'ModelVersion')
+    Sequence = apps.get_model('documents', 'Sequence')
+
+    for sequence in Sequence.objects.filter(name='catalog'):
+        ModelVersion.objects.create(
+            model=sequence.name,
+            version=sequence.value,
+            modified=timezone.now(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_catalog_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequence',
+                'verbose_name_plural': 'Sequences',
+            },
+        ),
+        migrations.RunPython(move_catalog_version, restore_catalog_version),
+    ]
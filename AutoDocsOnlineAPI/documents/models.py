@@ -1,10 +1,13 @@
+import hashlib
 import uuid
 
 from django.conf import settings
 from django.core.validators import MinLengthValidator
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
+from core.formatters import DocumentPlan
 from core.utils import make_documents_directory_path, short
 from core.models import CreatedModel
 from users.models import User
@@ -12,6 +15,10 @@ from users.models import User
 from .validators import NameInDocumentRegexValidator
 
 
+# sequence of change versions of official templates catalog
+CATALOG_SEQUENCE = 'catalog'
+
+
 class Category(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(
@@ -21,6 +28,9 @@ class Category(models.Model):
     description = models.TextField(
         max_length=settings.CATEGORY_DESCRIPTION_MAX_LENGTH
     )
+    change_version = models.BigIntegerField(
+        default=0, editable=False, db_index=True
+    )
 
     class Meta:
         verbose_name = 'Category'
@@ -30,6 +40,19 @@ class Category(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs) -> None:
+        with transaction.atomic():
+            self.change_version = Sequence.objects.next_value(
+                CATALOG_SEQUENCE
+            )
+            _add_update_field(kwargs, 'change_version')
+            super().save(*args, **kwargs)
+
+            # official templates are serialized with title of category
+            self.templates.filter(is_official=True).update(
+                change_version=self.change_version
+            )
+
 
 class Template(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -77,9 +100,14 @@ class Template(models.Model):
         blank=True,
         default=False,
     )
+    change_version = models.BigIntegerField(
+        default=0, editable=False, db_index=True
+    )
 
     class Meta:
         ordering = ["-title"]
+        # keyset pagination of templates
+        indexes = [models.Index(fields=['title', 'id'])]
         verbose_name = 'Template'
         verbose_name_plural = "Templates"
 
@@ -113,8 +141,39 @@ class Template(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs) -> None:
+        # template is removed from official catalog
+        demoted = (
+            not self.is_official
+            and not self._state.adding
+            and Template.objects.filter(pk=self.pk, is_official=True).exists()
+        )
+
+        # only templates of catalog take version, other templates are
+        # saved without lock of catalog sequence
+        if not self.is_official and not demoted:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            self.change_version = Sequence.objects.next_value(
+                CATALOG_SEQUENCE
+            )
+            _add_update_field(kwargs, 'change_version')
+
+            if demoted:
+                Tombstone.objects.create(
+                    model=Template._meta.label_lower,
+                    object_id=self.pk,
+                    change_version=self.change_version,
+                )
+
+            super().save(*args, **kwargs)
+
 
 class TemplateValue(models.Model):
+    # order of values of record in responses
+    RECORD_ORDERING = ('template__title', 'template_id')
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     template = models.ForeignKey(
         Template,
@@ -194,10 +253,18 @@ class Document(CreatedModel):
         verbose_name = 'Document'
         verbose_name_plural = "Documents"
         ordering = ['creation_date']
+        # keyset pagination of documents
+        indexes = [models.Index(fields=['creation_date', 'id'])]
 
     def __str__(self):
         return ' '.join(map(str, [self.author, self.title]))
 
+    def save(self, *args, **kwargs) -> None:
+        super().save(*args, **kwargs)
+
+        # compile placeholders plan if file is new or was replaced
+        DocumentPlan.ensure(self.file.path)
+
 
 class DocumentsPackage(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -225,6 +292,7 @@ class DocumentsPackage(models.Model):
     class Meta:
         verbose_name = 'Documents package'
         verbose_name_plural = "Documents packages"
+        ordering = ['title']
 
     def __str__(self):
         return ' '.join(map(str, [self.author, self.title]))
@@ -259,6 +327,11 @@ class Record(CreatedModel):
         verbose_name = 'Record'
         verbose_name_plural = "Records"
         ordering = ['creation_date']
+        # keyset pagination of records of user and of package
+        indexes = [
+            models.Index(fields=['user', 'creation_date', 'id']),
+            models.Index(fields=['documents_package', 'creation_date', 'id']),
+        ]
 
     def __str__(self):
         return ' '.join(
@@ -333,3 +406,118 @@ class RecordTemplateValue(models.Model):
     class Meta:
         verbose_name = 'RecordTemplateValue'
         verbose_name_plural = "RecordTemplateValue"
+
+
+def _add_update_field(save_kwargs: dict, name: str) -> None:
+    "Field is saved even if only some fields are updated."
+    if save_kwargs.get('update_fields') is not None:
+        save_kwargs['update_fields'] = {*save_kwargs['update_fields'], name}
+
+
+class ModelVersionQuerySet(models.QuerySet):
+    def bump(self, model) -> None:
+        "Increment version of model, it is changed on every change of rows."
+        label = model._meta.label_lower
+        changes = {
+            'version': models.F('version') + 1,
+            'modified': timezone.now(),
+        }
+
+        if self.filter(model=label).update(**changes):
+            return
+
+        _, created = self.get_or_create(
+            model=label, defaults={'modified': changes['modified']}
+        )
+        if not created:
+            self.filter(model=label).update(**changes)
+
+    def get_etag(self, models_list, key: str) -> str:
+        """
+        Return ETag of data made of models, key distinguishes different
+        data of the same models.
+        """
+        versions = sorted(
+            self.filter(
+                model__in=[model._meta.label_lower for model in models_list]
+            ).values_list('model', 'version')
+        )
+
+        return hashlib.sha256(f'{key}{versions}'.encode()).hexdigest()[:32]
+
+
+class ModelVersion(models.Model):
+    """
+    Version counter of model, it is incremented by signals when rows of
+    model are saved or deleted, so responses can be validated without
+    reading rows.
+    """
+    model = models.CharField(
+        max_length=settings.MODEL_VERSION_MODEL_MAX_LENGTH, primary_key=True
+    )
+    version = models.BigIntegerField(default=0)
+    modified = models.DateTimeField()
+
+    objects = ModelVersionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Model version'
+        verbose_name_plural = 'Model versions'
+
+    def __str__(self):
+        return ' '.join(map(str, [self.model, self.version]))
+
+
+class SequenceQuerySet(models.QuerySet):
+    def next_value(self, name: str) -> int:
+        """
+        Return next value of sequence. Row of sequence is locked until
+        end of transaction, so values are committed in order.
+        """
+        with transaction.atomic():
+            sequence, _ = self.select_for_update().get_or_create(name=name)
+            sequence.value += 1
+            sequence.save(update_fields=('value',))
+
+        return sequence.value
+
+    def get_value(self, name: str) -> int:
+        "Return committed value of sequence."
+        return self.filter(name=name).values_list(
+            'value', flat=True
+        ).first() or 0
+
+
+class Sequence(models.Model):
+    "Named counter of versions of changes, e.g. of official catalog."
+    name = models.CharField(
+        max_length=settings.SEQUENCE_NAME_MAX_LENGTH, primary_key=True
+    )
+    value = models.BigIntegerField(default=0)
+
+    objects = SequenceQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Sequence'
+        verbose_name_plural = 'Sequences'
+
+    def __str__(self):
+        return ' '.join(map(str, [self.name, self.value]))
+
+
+class Tombstone(models.Model):
+    "Object deleted from catalog, so clients can delete their copies."
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    model = models.CharField(
+        max_length=settings.MODEL_VERSION_MODEL_MAX_LENGTH
+    )
+    object_id = models.UUIDField()
+    change_version = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['model', 'change_version'])]
+        verbose_name = 'Tombstone'
+        verbose_name_plural = 'Tombstones'
+
+    def __str__(self):
+        return ' '.join(map(str, [self.model, self.object_id]))
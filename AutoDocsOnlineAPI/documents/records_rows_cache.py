@@ -0,0 +1,345 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from django.conf import settings
+from django.db.models import Q
+
+
+class StoredRows:
+    """
+    Rows of records read from opened file of cache while they are
+    iterated. Rows appended after size are not read.
+    """
+
+    def __init__(self, file, size: int, templates_pks: list):
+        self.file = file
+        self.size = size
+        self.templates_pks = templates_pks
+
+    def __iter__(self) -> Iterator[tuple]:
+        size = self.size
+
+        with self.file:
+            for line in self.file:
+                size -= len(line)
+                if size < 0:
+                    return
+
+                creation_date, values = json.loads(line)
+                yield (
+                    datetime.fromisoformat(creation_date),
+                    dict(zip(self.templates_pks, values)),
+                )
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class RecordsRowsCache:
+    """
+    Rows of records of documents packages stored on local disk as json
+    lines, one file for every package and set of its templates.
+    Records are only added, so stored rows are determined by high-water
+    mark: number of records and (creation date, id) of the newest one.
+    When new records are created, only their rows are fetched and
+    appended to the file. File is rebuilt if records were deleted.
+    Streamed rows are written to cache while they are yielded.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def get_rows(
+        self,
+        documents_package,
+        templates,
+        fetch_rows: Callable[..., Iterable[tuple]],
+    ) -> tuple[StoredRows, str]:
+        """
+        Return rows (creation date, {template id: value}) of all
+        records of package and version of rows, which is changed when
+        records are created or deleted.
+        fetch_rows(records, templates) yields rows of records queryset
+        ordered by creation date and id.
+        """
+        templates, templates_pks, key = self.__prepare(
+            documents_package, templates
+        )
+        records = documents_package.records.all()
+
+        with self.__lock(key):
+            mark = self.__get_mark(records)
+            stored = self.__read_mark(key)
+
+            if stored is None or stored['count'] > mark['count']:
+                stored = self.__rebuild(
+                    key, templates_pks, fetch_rows(records, templates)
+                )
+            elif not self.__is_same(stored, mark):
+                stored = self.__append(
+                    key, templates_pks, stored,
+                    fetch_rows(
+                        self.__get_new_records(records, stored), templates
+                    ),
+                )
+
+            # records created with the same date as stored newest record
+            # and smaller id are not appended
+            if not self.__is_same(stored, mark):
+                stored = self.__rebuild(
+                    key, templates_pks, fetch_rows(records, templates)
+                )
+
+            # rows appended later are after stored size
+            file = open(self.__get_path(key, 'jsonl'), 'rb')
+
+        version = f'{key}_{stored["count"]}_{stored["size"]}'
+
+        return StoredRows(file, stored['size'], templates_pks), version
+
+    def stream_rows(
+        self,
+        documents_package,
+        templates,
+        fetch_rows: Callable[..., Iterable[tuple]],
+    ) -> Iterator[tuple]:
+        """
+        Yield rows of get_rows without waiting until cache is filled.
+        Stored rows are read from file, fetched rows are yielded while
+        they are written to temporary file, which is added to cache
+        after last row. Cache is locked only to read and replace it.
+        """
+        templates, templates_pks, key = self.__prepare(
+            documents_package, templates
+        )
+        records = documents_package.records.all()
+
+        with self.__lock(key):
+            mark = self.__get_mark(records)
+            stored = self.__read_mark(key)
+            file = None
+            if stored is not None and stored['count'] <= mark['count']:
+                file = open(self.__get_path(key, 'jsonl'), 'rb')
+
+        if file is not None and self.__is_same(stored, mark):
+            yield from StoredRows(file, stored['size'], templates_pks)
+            return
+
+        new_records = None
+        if file is not None:
+            new_records = self.__get_new_records(records, stored)
+            # records created with the same date as stored newest record
+            # and smaller id are not new
+            if stored['count'] + new_records.count() != mark['count']:
+                file.close()
+                new_records = None
+
+        if new_records is None:
+            stored = None
+            rows = fetch_rows(records, templates)
+        else:
+            yield from StoredRows(file, stored['size'], templates_pks)
+            rows = fetch_rows(new_records, templates)
+
+        with self.__temporary_file() as tmp:
+            with tmp:
+                new_mark = dict(stored or {'count': 0})
+                yield from self.__tee_rows(tmp, templates_pks, rows, new_mark)
+
+            with self.__lock(key):
+                if stored is None:
+                    self.__replace(key, tmp.name, new_mark)
+                # rows are added to the same rows they were fetched after
+                elif self.__read_mark(key) == stored:
+                    self.__extend(key, tmp.name, new_mark)
+
+    def __rebuild(
+        self, key: str, templates_pks: list, rows: Iterable[tuple]
+    ) -> dict:
+        with self.__temporary_file() as tmp:
+            with tmp:
+                mark = self.__write_rows(
+                    tmp, templates_pks, rows, {'count': 0}
+                )
+
+            return self.__replace(key, tmp.name, mark)
+
+    def __append(
+        self, key: str, templates_pks: list, mark: dict, rows: Iterable[tuple]
+    ) -> dict:
+        path = self.__get_path(key, 'jsonl')
+        with open(path, 'a', encoding='utf-8') as file:
+            # rows of interrupted append are overwritten
+            file.truncate(mark['size'])
+            mark = self.__write_rows(file, templates_pks, rows, mark)
+
+        mark['size'] = os.path.getsize(path)
+        self.__write_mark(key, mark)
+
+        return mark
+
+    def __replace(self, key: str, rows_path: str, mark: dict) -> dict:
+        "Replace rows of key by written file of rows of mark."
+        # rows of previous templates of package are not used anymore
+        package_pk = key.split('_')[0]
+        for path in self.directory.glob(f'{package_pk}_*.json*'):
+            if not path.name.startswith(key):
+                path.unlink(missing_ok=True)
+
+        path = self.__get_path(key, 'jsonl')
+        os.replace(rows_path, path)
+        mark['size'] = os.path.getsize(path)
+        self.__write_mark(key, mark)
+
+        return mark
+
+    def __extend(self, key: str, rows_path: str, mark: dict) -> None:
+        "Add written file of rows to stored rows of size of mark."
+        path = self.__get_path(key, 'jsonl')
+        with open(path, 'ab') as file, open(rows_path, 'rb') as rows:
+            # rows of interrupted append are overwritten
+            file.truncate(mark['size'])
+            shutil.copyfileobj(rows, file)
+
+        mark['size'] = os.path.getsize(path)
+        self.__write_mark(key, mark)
+
+    @classmethod
+    def __write_rows(
+        cls, file, templates_pks: list, rows: Iterable[tuple], mark: dict
+    ) -> dict:
+        mark = dict(mark)
+        for _ in cls.__tee_rows(file, templates_pks, rows, mark):
+            pass
+
+        return mark
+
+    @staticmethod
+    def __tee_rows(
+        file, templates_pks: list, rows: Iterable[tuple], mark: dict
+    ) -> Iterator[tuple]:
+        "Yield (creation date, values) of rows written to file, update mark."
+        # values are stored in order of templates, keys are not repeated
+        for record_id, creation_date, values in rows:
+            line = [
+                creation_date.isoformat(),
+                [values.get(template_pk) for template_pk in templates_pks],
+            ]
+            file.write(json.dumps(line, ensure_ascii=False) + '\n')
+            mark['count'] += 1
+            mark['creation_date'] = creation_date.isoformat()
+            mark['id'] = str(record_id)
+
+            yield creation_date, values
+
+    @contextmanager
+    def __temporary_file(self):
+        "Temporary file of rows, it is removed unless it was moved."
+        tmp = tempfile.NamedTemporaryFile(
+            'w', encoding='utf-8', dir=self.directory, prefix='.',
+            delete=False,
+        )
+        try:
+            yield tmp
+        finally:
+            tmp.close()
+            Path(tmp.name).unlink(missing_ok=True)
+
+    def __prepare(self, documents_package, templates) -> tuple:
+        "Return sorted templates, their ids and key of rows."
+        templates = sorted(templates, key=lambda template: str(template.pk))
+        templates_pks = [template.pk for template in templates]
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        return (
+            templates,
+            templates_pks,
+            self.__get_key(documents_package, templates_pks),
+        )
+
+    @staticmethod
+    def __get_new_records(records, stored: dict):
+        "Records after stored newest record."
+        last_date = datetime.fromisoformat(stored['creation_date'])
+
+        return records.filter(
+            Q(creation_date__gt=last_date)
+            | Q(creation_date=last_date, id__gt=stored['id'])
+        )
+
+    @staticmethod
+    def __get_mark(records) -> dict:
+        newest = (
+            records
+            .order_by('-creation_date', '-id')
+            .values_list('creation_date', 'id')
+            .first()
+        )
+        mark = {'count': records.count()}
+
+        if newest is not None:
+            mark['creation_date'] = newest[0].isoformat()
+            mark['id'] = str(newest[1])
+
+        return mark
+
+    def __read_mark(self, key: str):
+        try:
+            with open(self.__get_path(key, 'json')) as file:
+                mark = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if not self.__get_path(key, 'jsonl').exists():
+            return None
+
+        return mark
+
+    @staticmethod
+    def __is_same(stored: dict, mark: dict) -> bool:
+        "Stored rows are rows of all records of mark."
+        return all(
+            stored.get(name) == mark.get(name)
+            for name in ('count', 'creation_date', 'id')
+        )
+
+    def __write_mark(self, key: str, mark: dict) -> None:
+        with tempfile.NamedTemporaryFile(
+            'w', dir=self.directory, prefix='.', delete=False
+        ) as tmp:
+            json.dump(mark, tmp)
+
+        os.replace(tmp.name, self.__get_path(key, 'json'))
+
+    @contextmanager
+    def __lock(self, key: str):
+        with open(self.__get_path(key, 'lock'), 'w') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def __get_key(documents_package, templates_pks: list) -> str:
+        columns = hashlib.sha256(
+            ','.join(map(str, templates_pks)).encode()
+        ).hexdigest()[:16]
+
+        return f'{documents_package.pk}_{columns}'
+
+    def __get_path(self, key: str, extension: str) -> Path:
+        return self.directory / f'{key}.{extension}'
+
+
+records_rows_cache = RecordsRowsCache(
+    settings.RECORDS_EXPORTS_CACHE_DIR / 'rows'
+)
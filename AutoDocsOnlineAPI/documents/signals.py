@@ -0,0 +1,107 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+
+from users.models import User
+
+from .models import (
+    CATALOG_SEQUENCE,
+    Category,
+    Document,
+    DocumentDocumentsPackage,
+    DocumentsPackage,
+    DocumentTemplate,
+    ModelVersion,
+    Sequence,
+    Template,
+    Tombstone,
+)
+
+
+# models of catalog-style responses validated by versions
+VERSIONED_MODELS = (
+    Category,
+    Document,
+    DocumentDocumentsPackage,
+    DocumentsPackage,
+    DocumentTemplate,
+    Template,
+    User,
+)
+
+
+# fields read by versioned responses, saves of other fields (e.g. last
+# login or confirmation code of user) keep version of model
+READ_FIELDS = {
+    User: ('username', 'email'),
+}
+
+
+def check_read_fields(sender, instance, update_fields=None, **kwargs) -> None:
+    "Mark saved object whose fields read by responses are changed."
+    fields = READ_FIELDS[sender]
+
+    if update_fields is not None:
+        changed = not set(fields).isdisjoint(update_fields)
+    elif instance._state.adding:
+        changed = True
+    else:
+        saved = sender.objects.filter(pk=instance.pk).values(*fields).first()
+        changed = saved is None or any(
+            saved[field] != getattr(instance, field) for field in fields
+        )
+
+    instance._read_fields_changed = changed
+
+
+def bump_version(sender, **kwargs) -> None:
+    """
+    Version is incremented after change, in its transaction. Responses
+    read versions before data, so data read before change is never sent
+    with version after it.
+    """
+    ModelVersion.objects.bump(sender)
+
+
+def bump_saved_version(sender, instance, **kwargs) -> None:
+    if getattr(instance, '_read_fields_changed', True):
+        bump_version(sender)
+
+
+def connect_versions() -> None:
+    for model in VERSIONED_MODELS:
+        if model in READ_FIELDS:
+            pre_save.connect(check_read_fields, sender=model)
+
+        post_save.connect(bump_saved_version, sender=model)
+        post_delete.connect(bump_version, sender=model)
+        m2m_changed.connect(bump_version, sender=model)
+
+
+def bury_catalog_object(sender, instance, **kwargs) -> None:
+    "Deleted official template or category is kept as tombstone."
+    if sender is Template and not instance.is_official:
+        return
+
+    Tombstone.objects.create(
+        model=sender._meta.label_lower,
+        object_id=instance.pk,
+        change_version=Sequence.objects.next_value(CATALOG_SEQUENCE),
+    )
+
+
+def touch_category_templates(sender, instance, **kwargs) -> None:
+    "Category of templates is set to null without signals of templates."
+    instance.templates.filter(is_official=True).update(
+        change_version=Sequence.objects.next_value(CATALOG_SEQUENCE)
+    )
+
+
+def connect_catalog_changes() -> None:
+    post_delete.connect(bury_catalog_object, sender=Template)
+    post_delete.connect(bury_catalog_object, sender=Category)
+    pre_delete.connect(touch_category_templates, sender=Category)
@@ -0,0 +1,139 @@
+import shutil
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from string import ascii_lowercase
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from docx import Document as DocxDocument
+
+from core.formatters import rendered_documents_cache
+
+from .exports import records_excel_cache
+from .models import (
+    Document,
+    DocumentsPackage,
+    Record,
+    Template,
+    TemplateValue,
+)
+from .records_rows_cache import records_rows_cache
+
+
+FILES_CACHES = (rendered_documents_cache, records_excel_cache)
+
+
+class TemporaryFilesMixin:
+    """
+    Media files and files caches of test are stored in temporary
+    directory, which is removed after test.
+    """
+
+    def setUp(self):
+        super().setUp()
+
+        self.files_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.files_directory, True)
+
+        media = override_settings(MEDIA_ROOT=self.files_directory / 'media')
+        media.enable()
+        self.addCleanup(media.disable)
+
+        for name, cache in (
+            ('rows', records_rows_cache),
+            ('excel', records_excel_cache),
+            ('rendered', rendered_documents_cache),
+        ):
+            patcher = mock.patch.object(
+                cache, 'directory', self.files_directory / name
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        for cache in FILES_CACHES:
+            patcher = mock.patch.object(cache, 'size', None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def clear_caches(self) -> None:
+        for cache in (records_rows_cache, *FILES_CACHES):
+            shutil.rmtree(cache.directory, ignore_errors=True)
+
+        for cache in FILES_CACHES:
+            cache.size = None
+
+
+def make_docx_file(names_in_document) -> ContentFile:
+    "Return .docx document with paragraph of every placeholder."
+    document = DocxDocument()
+    for name in names_in_document:
+        document.add_paragraph(name)
+
+    file_stream = BytesIO()
+    document.save(file_stream)
+
+    return ContentFile(file_stream.getvalue())
+
+
+def make_name(index: int) -> str:
+    "Name of index made of letters: a, b, ..., z, aa, ab, ..."
+    name = ''
+    index += 1
+    while index:
+        index, letter = divmod(index - 1, len(ascii_lowercase))
+        name = ascii_lowercase[letter] + name
+
+    return name
+
+
+def make_templates(author, count: int, prefix: str = 'template', **fields):
+    "Return templates, their names in document are valid placeholders."
+    return [
+        Template.objects.create(
+            author=author,
+            title=f'{prefix} {index}',
+            name_in_document=f'{{{{{prefix}_{make_name(index)}}}}}',
+            **fields,
+        )
+        for index in range(count)
+    ]
+
+
+def make_documents_package(author, templates, title: str = 'Package'):
+    "Return package with one document of all templates."
+    document = Document(author=author, title=f'{title} document')
+    document.file.save(
+        'document.docx',
+        make_docx_file(template.name_in_document for template in templates),
+        save=False,
+    )
+    document.save()
+    document.templates.set(templates)
+
+    documents_package = DocumentsPackage.objects.create(
+        title=title, author=author
+    )
+    documents_package.documents.set([document])
+
+    return documents_package
+
+
+def make_records(documents_package, user, templates, count: int):
+    "Return records with value of every template."
+    records = []
+
+    for index in range(count):
+        record = Record.objects.create(
+            user=user, documents_package=documents_package
+        )
+        record.templates_values.set([
+            TemplateValue.objects.get_or_create(
+                template=template, value=f'{template.title} {index}'
+            )[0]
+            for template in templates
+        ])
+        records.append(record)
+
+    return records
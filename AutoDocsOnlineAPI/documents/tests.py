@@ -0,0 +1,180 @@
+import json
+from unittest import mock
+
+from django.test import TestCase
+from openpyxl import load_workbook
+
+from core.formatters import (
+    DocumentPlan,
+    DocumentsFormatter,
+    records_formatter,
+)
+from users.models import User
+
+from .models import Record
+from .exports import get_records_excel, get_records_lines
+from .records_rows_cache import records_rows_cache
+from .testing import (
+    TemporaryFilesMixin,
+    make_documents_package,
+    make_records,
+    make_templates,
+)
+
+
+class FixturesTest(TemporaryFilesMixin, TestCase):
+    def test_templates_placeholders_are_found_and_filled(self):
+        user = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        templates = make_templates(user, 30)
+        documents_package = make_documents_package(user, templates)
+        record, = make_records(documents_package, user, templates, 1)
+        document = documents_package.documents.get()
+
+        self.assertEqual(
+            DocumentPlan.ensure(document.file.path).keys,
+            {template.name_in_document for template in templates},
+        )
+
+        text = DocumentsFormatter(
+            document.file.path, record.templates_values.all()
+        ).preview()['text']
+        self.assertEqual(
+            text.splitlines(),
+            [f'{template.title} 0' for template in templates],
+        )
+
+
+class RecordsExcelTest(TemporaryFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.templates = make_templates(self.user, 3)
+        self.documents_package = make_documents_package(
+            self.user, self.templates
+        )
+
+    def get_excel_rows(self) -> list[tuple]:
+        excel, _ = get_records_excel(self.documents_package)
+        with excel:
+            sheet = load_workbook(excel, read_only=True).active
+            return list(sheet.values)
+
+    def test_queries_do_not_depend_on_records(self):
+        "Documents, templates, mark of records and values of all records."
+        for records_count in (10, 20):
+            make_records(
+                self.documents_package, self.user, self.templates,
+                records_count - self.documents_package.records.count(),
+            )
+            self.clear_caches()
+
+            with self.assertNumQueries(5):
+                rows = self.get_excel_rows()
+
+            # header and row of every record
+            self.assertEqual(len(rows), 1 + records_count)
+
+    def test_records_without_values_are_exported_and_cached(self):
+        make_records(self.documents_package, self.user, self.templates, 2)
+        # templates added to document after records were created
+        Record.objects.create(
+            user=self.user, documents_package=self.documents_package
+        )
+
+        rows = self.get_excel_rows()
+        self.assertEqual(len(rows), 1 + 3)
+        self.assertEqual(rows[-1][:len(self.templates)], (None,) * 3)
+
+        # rows and excel are taken from cache: documents, templates and
+        # mark of records
+        with self.assertNumQueries(4):
+            self.assertEqual(self.get_excel_rows(), rows)
+
+
+class RecordsLinesTest(TemporaryFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.templates = make_templates(self.user, 2)
+        self.documents_package = make_documents_package(
+            self.user, self.templates
+        )
+
+    def get_lines(self) -> list[dict]:
+        chunks, _ = get_records_lines(self.documents_package, 'jsonl')
+        return [json.loads(line) for line in ''.join(chunks).splitlines()]
+
+    def test_rows_are_streamed_while_cached(self):
+        make_records(self.documents_package, self.user, self.templates, 3)
+        chunks, _ = get_records_lines(self.documents_package, 'csv')
+
+        # header is sent before rows are fetched
+        with self.assertNumQueries(0):
+            header = next(chunks)
+        lines = header + ''.join(chunks)
+        self.assertEqual(len(lines.splitlines()), 1 + 3)
+
+        # rows are read from cache filled by stream: documents, templates
+        # and mark of records
+        with self.assertNumQueries(4):
+            self.assertEqual(len(self.get_lines()), 3)
+
+        # only new rows are fetched and added to cache
+        make_records(self.documents_package, self.user, self.templates, 2)
+        lines = self.get_lines()
+        self.assertEqual(len(lines), 5)
+        with self.assertNumQueries(4):
+            self.assertEqual(self.get_lines(), lines)
+
+        # rows of get_rows are the same
+        excel, _ = get_records_excel(self.documents_package)
+        with excel:
+            sheet = load_workbook(excel, read_only=True).active
+            self.assertEqual(len(list(sheet.values)), 1 + 5)
+
+    def test_interrupted_stream_is_not_cached(self):
+        make_records(self.documents_package, self.user, self.templates, 3)
+        with mock.patch.object(records_formatter, 'LINES_PER_CHUNK', 1):
+            chunks, _ = get_records_lines(self.documents_package, 'csv')
+            next(chunks)
+            next(chunks)
+            chunks.close()
+
+        self.assertEqual(
+            [path.name for path in records_rows_cache.directory.iterdir()
+             if not path.name.endswith('.lock')],
+            [],
+        )
+        self.assertEqual(len(self.get_lines()), 3)
+
+    def test_values_of_templates_with_same_title_are_kept(self):
+        user = self.user
+        templates = make_templates(user, 2, prefix='other')
+        for template in templates:
+            template.title = 'Name'
+            template.save()
+
+        documents_package = make_documents_package(
+            user, templates, title='Other'
+        )
+        make_records(documents_package, user, templates, 1)
+
+        chunks, _ = get_records_lines(documents_package, 'jsonl')
+        line = json.loads(''.join(chunks))
+
+        self.assertEqual(
+            {
+                template.name_in_document: line[template.name_in_document]
+                for template in templates
+            },
+            {
+                template.name_in_document: 'Name 0'
+                for template in templates
+            },
+        )
@@ -0,0 +1,24 @@
+from django.contrib import admin
+
+from core.admin import object_url
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'kind',
+        'user_',
+        'status',
+        'creation_date',
+        'finished_at',
+        'pk',
+    )
+    list_filter = ('kind', 'status')
+    search_fields = ('user__username',)
+    empty_value_display = '-empty-'
+
+    @admin.display(empty_value='unknown', description="user")
+    def user_(self, obj):
+        return object_url(obj.user)
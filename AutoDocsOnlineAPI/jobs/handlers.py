@@ -0,0 +1,81 @@
+from django.core.files import File
+from django.utils import timezone
+
+from core.formatters import DocumentsFormatter, RenderTimeoutError
+from documents.exports import (
+    get_filled_documents_zip,
+    get_packages_excel,
+    get_records_excel,
+)
+from documents.models import DocumentsPackage, Record
+
+from .models import Job
+
+
+def render_document(params):
+    record = Record.objects.get(pk=params['record'])
+    document = record.documents_package.documents.get(
+        pk=params['document_id']
+    )
+
+    formatted_document = DocumentsFormatter(
+        document.file.path,
+        record.templates_values.select_related('template')
+    ).format_cached()
+
+    return formatted_document, document.file.name.split('/')[-1]
+
+
+def render_documents(params):
+    record = Record.objects.select_related('documents_package').get(
+        pk=params['record']
+    )
+    return get_filled_documents_zip(record)
+
+
+def make_records_excel(params):
+    documents_package = DocumentsPackage.objects.get(
+        pk=params['documents_package']
+    )
+
+    return get_records_excel(documents_package)
+
+
+def make_packages_excel(params):
+    documents_packages = DocumentsPackage.objects.filter(
+        pk__in=params['documents_packages']
+    ).order_by('title')
+
+    return get_packages_excel(documents_packages)
+
+
+# every handler returns (opened file, filename) of job result
+HANDLERS = {
+    Job.DOCUMENT: render_document,
+    Job.DOCUMENTS: render_documents,
+    Job.RECORDS_EXCEL: make_records_excel,
+    Job.PACKAGES_EXCEL: make_packages_excel,
+}
+
+
+def run_job(job: Job) -> None:
+    "Run claimed job and save its result or error."
+    try:
+        file, filename = HANDLERS[job.kind](job.params)
+
+        with file:
+            job.result.save(filename, File(file), save=False)
+
+        job.status = Job.DONE
+    except RenderTimeoutError as error:
+        job.status = Job.FAILED
+        job.error = f'Document render took too long: {error}'
+    except Exception as error:
+        job.status = Job.FAILED
+        job.error = f'{type(error).__name__}: {error}'
+
+    job.finished_at = timezone.now()
+
+    if not Job.objects.finish(job) and job.result:
+        # job is run by other worker, result of lost lease is not used
+        job.result.delete(save=False)
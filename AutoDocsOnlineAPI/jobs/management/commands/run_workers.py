@@ -0,0 +1,123 @@
+import os
+import signal
+import threading
+import time
+from multiprocessing import Process
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.formatters import render_pool
+from jobs.handlers import run_job
+from jobs.models import Job
+
+
+class Heartbeat(threading.Thread):
+    "Extend lease of running job until it is finished."
+
+    def __init__(self, job: Job):
+        super().__init__(daemon=True)
+        self.job = job
+        self.finished = threading.Event()
+
+    def run(self) -> None:
+        try:
+            while not self.finished.wait(settings.JOBS_HEARTBEAT_INTERVAL):
+                Job.objects.extend_lease(self.job)
+        finally:
+            # connection of this thread
+            connections.close_all()
+
+    def stop(self) -> None:
+        self.finished.set()
+        self.join()
+
+
+class Worker:
+    """
+    Claim and run jobs until stopped or until queue is empty if burst.
+    On SIGTERM/SIGINT worker finishes current job and stops.
+    Idle worker deletes expired jobs and their results.
+    """
+
+    def __init__(self, burst: bool):
+        self.burst = burst
+        self.stopped = False
+        self.cleaned_at = None
+
+    def stop(self, *args) -> None:
+        self.stopped = True
+
+    def run(self) -> None:
+        django.setup()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        # worker is already separate process, it renders documents itself
+        render_pool.size = 0
+
+        while not self.stopped:
+            job = Job.objects.claim()
+
+            if job is not None:
+                heartbeat = Heartbeat(job)
+                heartbeat.start()
+                try:
+                    run_job(job)
+                finally:
+                    heartbeat.stop()
+            elif self.burst:
+                break
+            else:
+                self.clean()
+                time.sleep(settings.JOBS_POLL_INTERVAL)
+
+    def clean(self) -> None:
+        now = time.monotonic()
+        if (
+            self.cleaned_at is None
+            or now - self.cleaned_at >= settings.JOBS_CLEANUP_INTERVAL
+        ):
+            Job.objects.delete_expired()
+            self.cleaned_at = now
+
+
+class Command(BaseCommand):
+    help = 'Run workers of background jobs queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='number of worker processes'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            default=False,
+            help='stop workers when queue is empty'
+        )
+
+    def handle(self, workers, burst, **options):
+        # workers must not share database connections with main process
+        connections.close_all()
+
+        processes = [
+            Process(target=Worker(burst).run) for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        def stop(*args):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        print(f'started {workers} workers')
+
+        for process in processes:
+            process.join()
@@ -0,0 +1,40 @@
+# Generated by Django 3.2 on 2026-10-18 16:41
+
+import core.utils.make_job_directory_path
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import jobs.models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('creation_date', models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('document', 'Filled document of record'), ('documents', 'Zip of all filled documents of record'), ('records_excel', 'Excel summary of documents package records')], max_length=30)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('result', models.FileField(blank=True, max_length=255, storage=jobs.models.get_results_storage, upload_to=core.utils.make_job_directory_path.make_jobs_directory_path)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Jobs',
+                'ordering': ['creation_date'],
+            },
+        ),
+    ]
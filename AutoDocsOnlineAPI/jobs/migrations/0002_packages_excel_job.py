@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('document', 'Filled document of record'), ('documents', 'Zip of all filled documents of record'), ('records_excel', 'Excel summary of documents package records'), ('packages_excel', 'Excel summary of records of documents packages, sheet per package')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,174 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import CreatedModel
+from core.utils import make_jobs_directory_path
+from users.models import User
+
+
+def get_results_storage():
+    "Results are private, so they are not stored in media."
+    return FileSystemStorage(location=settings.JOBS_RESULTS_ROOT)
+
+
+class JobQuerySet(models.QuerySet):
+    def claim(self):
+        """
+        Mark the oldest pending job as running and return it or None.
+        Every job is claimed only by one worker for lease time, running
+        job of stopped worker is claimed again when its lease is expired.
+        Job is failed if it is not finished after max attempts.
+        """
+        now = timezone.now()
+        expired = Q(status=Job.RUNNING, lease_expires_at__lt=now)
+
+        self.filter(
+            expired, attempts__gte=settings.JOBS_MAX_ATTEMPTS
+        ).update(
+            status=Job.FAILED,
+            error='Job was not finished by workers.',
+            finished_at=now,
+        )
+
+        claimable = Q(status=Job.PENDING) | expired
+        candidates = self.filter(claimable).order_by('creation_date')
+        changes = {
+            'status': Job.RUNNING,
+            'started_at': now,
+            'lease_expires_at': self.__get_lease_expiry(),
+            'attempts': F('attempts') + 1,
+        }
+
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                job = candidates.select_for_update(skip_locked=True).first()
+                if job is None:
+                    return None
+
+                self.filter(pk=job.pk).update(**changes)
+
+            return self.get(pk=job.pk)
+
+        # without skip locked (sqlite), update of status works as
+        # compare-and-swap: only one worker changes status and lease
+        # of claimable job
+        for pk in candidates.values_list('pk', flat=True)[
+            :settings.JOBS_CLAIM_CANDIDATES
+        ]:
+            if self.filter(claimable, pk=pk).update(**changes):
+                return self.get(pk=pk)
+
+        return None
+
+    def extend_lease(self, job) -> None:
+        "Heartbeat of worker which is running job."
+        self.__claimed(job).update(lease_expires_at=self.__get_lease_expiry())
+
+    def finish(self, job) -> bool:
+        """
+        Save status, result and error of claimed job. Return False if
+        job was claimed again by other worker after expiry of lease,
+        then job is not changed.
+        """
+        return bool(self.__claimed(job).update(
+            status=job.status,
+            result=job.result.name,
+            error=job.error,
+            finished_at=job.finished_at,
+        ))
+
+    def delete_expired(self) -> int:
+        "Delete finished jobs older than max age with their results."
+        finished_before = timezone.now() - timedelta(
+            seconds=settings.JOBS_RESULTS_MAX_AGE
+        )
+        deleted, _ = self.filter(
+            status__in=(Job.DONE, Job.FAILED),
+            finished_at__lt=finished_before,
+        ).delete()
+
+        return deleted
+
+    def __claimed(self, job):
+        "Job while it is claimed by worker, every claim is new attempt."
+        return self.filter(
+            pk=job.pk, status=Job.RUNNING, attempts=job.attempts
+        )
+
+    @staticmethod
+    def __get_lease_expiry():
+        return timezone.now() + timedelta(seconds=settings.JOBS_LEASE_TIMEOUT)
+
+
+class Job(CreatedModel):
+    DOCUMENT = 'document'
+    DOCUMENTS = 'documents'
+    RECORDS_EXCEL = 'records_excel'
+    PACKAGES_EXCEL = 'packages_excel'
+    KINDS = (
+        (DOCUMENT, 'Filled document of record'),
+        (DOCUMENTS, 'Zip of all filled documents of record'),
+        (RECORDS_EXCEL, 'Excel summary of documents package records'),
+        (
+            PACKAGES_EXCEL,
+            'Excel summary of records of documents packages, '
+            'sheet per package',
+        ),
+    )
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        models.CASCADE,
+        related_name='jobs'
+    )
+    kind = models.CharField(
+        max_length=settings.JOB_KIND_MAX_LENGTH,
+        choices=KINDS,
+    )
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=settings.JOB_STATUS_MAX_LENGTH,
+        choices=STATUSES,
+        default=PENDING,
+        db_index=True,
+    )
+    result = models.FileField(
+        upload_to=make_jobs_directory_path,
+        storage=get_results_storage,
+        max_length=settings.JOB_RESULT_MAX_LENGTH,
+        blank=True,
+    )
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # running job is claimed again when lease of its worker is expired
+    lease_expires_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ['creation_date']
+
+    def __str__(self):
+        return ' '.join(map(str, [self.user, self.kind, self.status]))
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete
+
+from .models import Job
+
+
+def delete_result(sender, instance, **kwargs) -> None:
+    "Results of deleted jobs are not kept in results storage."
+    if instance.result:
+        instance.result.delete(save=False)
+
+
+def connect_results() -> None:
+    post_delete.connect(delete_result, sender=Job)
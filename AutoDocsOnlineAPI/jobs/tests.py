@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase
+from django.utils import timezone
+
+from users.models import User
+
+from .handlers import HANDLERS, run_job
+from .models import Job
+
+
+class RunJobTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.storage = FileSystemStorage(location=directory)
+
+        patcher = mock.patch.object(
+            Job._meta.get_field('result'), 'storage', self.storage
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.dict(
+            HANDLERS,
+            {Job.RECORDS_EXCEL: lambda params: (BytesIO(b'result'), 'a.txt')},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        Job.objects.create(user=self.user, kind=Job.RECORDS_EXCEL)
+
+    def expire_lease(self) -> None:
+        Job.objects.update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_claimed_job_is_finished(self):
+        job = Job.objects.claim()
+        run_job(job)
+
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result.read(), b'result')
+
+    def test_job_of_lost_lease_is_not_changed(self):
+        job = Job.objects.claim()
+        self.expire_lease()
+        reclaimed = Job.objects.claim()
+        self.assertEqual(reclaimed.pk, job.pk)
+
+        # first worker finishes after job was claimed again
+        run_job(job)
+        Job.objects.extend_lease(job)
+
+        job = Job.objects.get()
+        self.assertEqual(
+            (job.status, job.attempts, job.lease_expires_at, job.result),
+            (
+                Job.RUNNING,
+                2,
+                reclaimed.lease_expires_at,
+                reclaimed.result,
+            ),
+        )
+        # result of lost lease is removed
+        self.assertFalse(
+            any(files for _, _, files in os.walk(self.storage.location))
+        )
+
+        run_job(reclaimed)
+        self.assertEqual(Job.objects.get().status, Job.DONE)